@@ -0,0 +1,111 @@
+# Measures fuzzy name lookups per second over the ludusavi manifest.
+#
+#   python benchmarks/bench_fuzzy_lookup.py [--manifest manifest.yaml] [--queries 5000]
+#
+# Queries are manifest names with a typo, a dropped word or a suffix, plus names
+# that are not in the manifest. The trigram index is measured on the in-memory
+# index and on the memory-mapped binary one; the word buckets it replaced are
+# rebuilt here for comparison.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_queries(names, count: int):
+    random.seed(0)
+    queries = []
+    for name in random.sample(names, min(len(names), count * 3 // 4)):
+        words = name.split()
+        variant = random.randrange(3)
+        if variant == 0 and len(name) > 4:
+            position = random.randrange(len(name))
+            query = name[:position] + random.choice("abcdefghijklmnopqrstuvwxyz") + name[position + 1:]
+        elif variant == 1 and len(words) > 1:
+            query = " ".join(words[:-1])
+        else:
+            query = f"{name} goty"
+        queries.append((query, name))
+    queries += [(f"unreleased prototype {i}", None) for i in range(count - len(queries))]
+    random.shuffle(queries)
+    return queries
+
+def word_bucket_lookup(buckets, query: str, cutoff: int = 50):
+    def _simple_match_score(a: str, b: str) -> int:
+        a, b = a.lower(), b.lower()
+        if a == b:
+            return 100
+        if a in b or b in a:
+            return 90
+        common = set(a.split()) & set(b.split())
+        return int(80 * len(common) / max(len(a.split()), len(b.split())))
+
+    best_name, best_score = None, 0
+    for term in {query} | set(query.split()):
+        for name in buckets.get(term, ()):
+            score = _simple_match_score(term, name)
+            if score > best_score:
+                best_score, best_name = score, name
+    return best_name if best_score >= cutoff else None
+
+def run(label: str, lookup, queries) -> None:
+    start = time.perf_counter()
+    correct = 0
+    for query, expected in queries:
+        if lookup(query) == expected:
+            correct += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20}{len(queries) / elapsed:>14.0f}{elapsed:>10.2f}{100 * correct / len(queries):>11.1f}%")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy name lookups over the ludusavi index.")
+    parser.add_argument("--manifest", help="ludusavi manifest.yaml (defaults to the downloaded one)")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--cutoff", type=float, default=None)
+    args = parser.parse_args()
+
+    from config import FUZZY_MATCH_CUTOFF, YAML_FILE
+    from identify_game import derive_yaml_view, index_yaml_stream
+    from index_store import load_binary_index, save_binary_index
+
+    cutoff = FUZZY_MATCH_CUTOFF if args.cutoff is None else args.cutoff
+    manifest = args.manifest or YAML_FILE
+    yaml_index = index_yaml_stream(manifest)
+    names = list(yaml_index["by_name"])
+    queries = make_queries(names, args.queries)
+    print(f"{len(names)} names, {len(yaml_index['by_name_trigram'])} trigrams, {len(queries)} queries, cutoff {cutoff}")
+
+    buckets = {}
+    for name in names:
+        for part in set(name.split()):
+            if len(part) > 2:
+                buckets.setdefault(part, []).append(name)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index_path = os.path.join(temp_dir, "yaml_index.bin")
+        save_binary_index(yaml_index, index_path)
+        binary_index = load_binary_index(index_path)
+
+        start = time.perf_counter()
+        in_memory = derive_yaml_view(yaml_index, "by_name_trigram")
+        mapped = derive_yaml_view(binary_index, "by_name_trigram")
+        print(f"Trigram views ready in {time.perf_counter() - start:.3f}s")
+
+        def trigram_lookup(trigram_index):
+            def lookup(query: str):
+                score, name = trigram_index.best_match(query, cutoff)
+                return name or None
+            return lookup
+
+        print(f"{'index':<20}{'lookups/s':>14}{'total s':>10}{'top-1':>12}")
+        run("word buckets", lambda query: word_bucket_lookup(buckets, query), queries)
+        run("trigram (dict)", trigram_lookup(in_memory), queries)
+        run("trigram (binary)", trigram_lookup(mapped), queries)
+        del mapped
+        binary_index.close()
+
+if __name__ == "__main__":
+    main()
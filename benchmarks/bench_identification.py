@@ -0,0 +1,298 @@
+# Runs identify_game against a generated game library and manifest fixture.
+#
+#   python benchmarks/bench_identification.py [--games 500] [--sync-folders 2] [--depth 3] [--json]
+#
+# Every game folder is built to be found by one phase: ludusavi install dir,
+# platform files (goggame-*.info, steam_appid.txt), GBM/ludusavi exe names,
+# fuzzy name, or nothing at all (the folder name is the expected result).
+# Decoy redistributables, helper exes and filler data sit next to the real exe.
+# "steam_nested" folders keep steam_appid.txt at the root and their only exe a
+# level down, named after nothing in the manifest, so only the platform id
+# (resolved once a deeper level of the walk has found the exe) identifies them.
+# "unknown" folders carry a settings.ini whose notgogid= key holds the GOG id of
+# another game; the platform scan must not read it as a GOG id.
+#
+# Each run happens in a fresh interpreter whose HOME points at the fixture, so
+# the user's indexes, scan cache and games.json are never touched and peak RSS
+# is per run. Manifest downloads are disabled; indexes are built from the fixture.
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KINDS = ("install_dir", "gog", "steam", "steam_nested", "xml", "yaml_exe", "name", "unknown")
+PHASES = {
+    "install_dir": "install_dir",
+    "gog": "platform",
+    "steam": "platform",
+    "steam_nested": "platform",
+    "xml": "xml_yaml",
+    "yaml_exe": "xml_yaml",
+    "name": "xml_yaml",
+    "unknown": "fallback",
+}
+ADJECTIVES = ("Crimson", "Silent", "Broken", "Hollow", "Eternal", "Iron", "Lost", "Neon", "Frozen", "Wild",
+              "Ancient", "Shattered", "Golden", "Distant", "Sunken", "Burning")
+NOUNS = ("Kingdom", "Horizon", "Knight", "Harbor", "Citadel", "Voyage", "Forest", "Signal", "Empire", "Garden",
+         "Frontier", "Dungeon", "Station", "Legacy", "Orchard", "Tides")
+DECOY_EXES = ("UnityCrashHandler64.exe", "unins000.exe", "dxwebsetup.exe")
+LOGINUSERS_VDF = '"users"\n{\n\t"76561197960287930"\n\t{\n\t\t"AccountName"\t\t"bench"\n\t\t"MostRecent"\t\t"1"\n\t}\n}\n'
+
+def peak_rss_kb() -> int:
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def game_name(i: int) -> str:
+    return f"{ADJECTIVES[i % len(ADJECTIVES)]} {NOUNS[(i // len(ADJECTIVES)) % len(NOUNS)]} {i}"
+
+def slug(name: str) -> str:
+    return "".join(word.capitalize() for word in name.split())
+
+def touch(path: str, content: str = "") -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+def add_filler(game_path: str, depth: int, files: int, helper_exes: int, decoys: bool) -> None:
+    current = game_path
+    for level in range(depth):
+        current = os.path.join(current, f"data{level}")
+        for j in range(files):
+            touch(os.path.join(current, f"chunk{j}.pak"))
+    for j in range(helper_exes):
+        touch(os.path.join(game_path, "tools", f"helper{j}.exe"))
+    if decoys:
+        touch(os.path.join(game_path, "_CommonRedist", "vcredist", "vcredist_x64.exe"))
+        for decoy in DECOY_EXES:
+            touch(os.path.join(game_path, decoy))
+
+def generate_library(base_dir: str, args) -> dict:
+    # Returns {"games": {folder: (kind, expected game_name)}, "sync_folders": [...], "manifest": {...}, "gbm": {...}}
+    random.seed(args.seed)
+    sync_folders = [os.path.join(base_dir, "library", f"drive{n}") for n in range(args.sync_folders)]
+    manifest = {}
+    gbm = {}
+    games = {}
+
+    for i in range(args.games):
+        kind = KINDS[i % len(KINDS)]
+        name = game_name(i)
+        exe_name = f"{slug(name)}.exe"
+        sync_folder = sync_folders[i % len(sync_folders)]
+        entry = {"files": {f"<winAppData>/{slug(name)}/*.sav": {"tags": ["save"]}}}
+
+        if kind == "install_dir":
+            folder = slug(name)
+            entry["installDir"] = {folder: {}}
+            entry["launch"] = {f"<base>/Binaries/Win64/{exe_name}": [{"when": [{"os": "windows"}]}]}
+            exe_path = os.path.join(sync_folder, folder, "Binaries", "Win64", exe_name)
+        elif kind == "gog":
+            folder = f"GOG Games {i}"
+            gog_id = 1200000000 + i
+            entry["gog"] = {"id": gog_id}
+            exe_path = os.path.join(sync_folder, folder, exe_name)
+            touch(os.path.join(sync_folder, folder, f"goggame-{gog_id}.info"), json.dumps({
+                "gameId": str(gog_id), "rootGameId": str(gog_id), "name": name,
+                "playTasks": [{"isPrimary": True, "type": "FileTask", "path": exe_name}]
+            }))
+        elif kind == "steam":
+            folder = f"steam-{i}"
+            steam_id = 400000 + i
+            entry["steam"] = {"id": steam_id}
+            entry["launch"] = {f"<base>/{exe_name}": [{}]}
+            exe_path = os.path.join(sync_folder, folder, exe_name)
+            touch(os.path.join(sync_folder, folder, "steam_appid.txt"), str(steam_id))
+        elif kind == "steam_nested":
+            folder = f"Steam Copy {i}"
+            steam_id = 400000 + i
+            entry["steam"] = {"id": steam_id}
+            exe_path = os.path.join(sync_folder, folder, "bin", "Something.exe")
+            touch(os.path.join(sync_folder, folder, "steam_appid.txt"), str(steam_id))
+        elif kind == "xml":
+            folder = f"Install {i}"
+            gbm[slug(name).lower()] = name
+            exe_path = os.path.join(sync_folder, folder, "bin", exe_name)
+        elif kind == "yaml_exe":
+            folder = f"Package {i}"
+            entry["launch"] = {f"<base>/{exe_name}": [{}]}
+            exe_path = os.path.join(sync_folder, folder, "game", exe_name)
+        elif kind == "name":
+            folder = name
+            exe_path = os.path.join(sync_folder, folder, "launcher.exe")
+        else:
+            folder = f"Unlisted Project {i}"
+            exe_path = os.path.join(sync_folder, folder, f"proj{i}.exe")
+            name = folder
+            other_gog_id = 1200000000 + i - i % len(KINDS) + KINDS.index("gog")
+            touch(os.path.join(sync_folder, folder, "settings.ini"), f"[online]\nnotgogid={other_gog_id}\n")
+
+        if kind != "unknown":
+            manifest[game_name(i)] = entry
+        touch(exe_path)
+        # Root-level decoys would hand steam_nested folders an exe on the first level.
+        add_filler(os.path.join(sync_folder, folder), args.depth, args.files, args.exes,
+                   args.decoys and kind != "steam_nested")
+        games[folder] = (kind, name)
+
+    # Manifest entries with no folder on disk, so lookups run against a realistically sized index.
+    for i in range(args.games, args.games + args.manifest_games):
+        name = game_name(i)
+        manifest[name] = {
+            "installDir": {slug(name): {}},
+            "launch": {f"<base>/{slug(name)}.exe": [{}]},
+            "steam": {"id": 400000 + i},
+        }
+        if i % 3 == 0:
+            gbm[slug(name).lower()] = name
+
+    return {"games": games, "sync_folders": sync_folders, "manifest": manifest, "gbm": gbm}
+
+def write_fixture(home: str, library: dict) -> None:
+    import yaml
+
+    touch(os.path.join(home, ".local", "share", "Steam", "config", "loginusers.vdf"), LOGINUSERS_VDF)
+    data_dir = os.path.join(home, "noSteam2Steam_Data")
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, "manifest.yaml"), 'w', encoding='utf-8') as f:
+        yaml.safe_dump(library["manifest"], f, allow_unicode=True, sort_keys=False)
+
+    root = ET.Element("GBM")
+    for process_name, name in library["gbm"].items():
+        game = ET.SubElement(root, "Game")
+        ET.SubElement(game, "Name").text = name
+        ET.SubElement(game, "ProcessName").text = process_name
+    ET.ElementTree(root).write(os.path.join(data_dir, "GBM_Official.xml"), encoding="utf-8")
+
+    with open(os.path.join(data_dir, "sync_folders.txt"), 'w', encoding='utf-8') as f:
+        f.write("\n".join(library["sync_folders"]))
+
+def run_child(mode: str, sync_folders_json: str) -> None:
+    sync_folders = json.loads(sync_folders_json)
+    dir_reads = [0]
+    real_scandir = os.scandir
+
+    def counting_scandir(path="."):
+        dir_reads[0] += 1
+        return real_scandir(path)
+
+    import identify_game
+    from config import XML_FILE, YAML_FILE
+
+    identify_game.download_file = lambda url, destination: False
+    start = time.perf_counter()
+    indexes = identify_game.create_or_update_indexes()
+    indexed = time.perf_counter()
+
+    os.scandir = counting_scandir
+    passes = []
+    for _ in range(2):
+        dir_reads[0] = 0
+        pass_start = time.perf_counter()
+        if mode == "run_identification":
+            matches = identify_game.run_identification()
+        else:
+            matches = {}
+            for sync_folder in sync_folders:
+                matches.update(identify_game.associate_exes_with_ids(sync_folder, XML_FILE, YAML_FILE, indexes, 8))
+        passes.append({
+            "wall_s": time.perf_counter() - pass_start,
+            "dir_reads": dir_reads[0],
+            "matches": {folder: data.get("game_name") for folder, data in matches.items()},
+        })
+    os.scandir = real_scandir
+
+    print(json.dumps({"index_s": indexed - start, "passes": passes, "max_rss_kb": peak_rss_kb()}))
+
+def score(games: dict, matches: dict) -> dict:
+    by_kind = {kind: [0, 0] for kind in KINDS}
+    for folder, (kind, expected) in games.items():
+        by_kind[kind][1] += 1
+        if matches.get(folder) == expected:
+            by_kind[kind][0] += 1
+    return by_kind
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark game identification on a synthetic library.")
+    parser.add_argument("--games", type=int, default=500, help="game folders to generate")
+    parser.add_argument("--sync-folders", type=int, default=2, help="sync folders the games are spread over")
+    parser.add_argument("--depth", type=int, default=3, help="nested data directories per game")
+    parser.add_argument("--files", type=int, default=4, help="filler files per data directory")
+    parser.add_argument("--exes", type=int, default=2, help="helper exes per game")
+    parser.add_argument("--no-decoys", dest="decoys", action="store_false", help="skip redistributable decoys")
+    parser.add_argument("--manifest-games", type=int, default=5000, help="extra manifest entries with no folder")
+    parser.add_argument("--mode", choices=("associate", "run_identification", "both"), default="both")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", help="generate the fixture in this directory and keep it")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SYNC_FOLDERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    base_dir = args.keep or tempfile.mkdtemp(prefix="ns2s-bench-")
+    try:
+        start = time.perf_counter()
+        library = generate_library(base_dir, args)
+        home = os.path.join(base_dir, "home")
+        write_fixture(home, library)
+        if not args.json:
+            print(f"{len(library['games'])} game folders in {len(library['sync_folders'])} sync folders, "
+                  f"{len(library['manifest'])} manifest games, {len(library['gbm'])} GBM games "
+                  f"(generated in {time.perf_counter() - start:.1f}s at {base_dir})")
+
+        modes = ("associate", "run_identification") if args.mode == "both" else (args.mode,)
+        results = {}
+        for mode in modes:
+            # Start every mode from a cold scan cache and freshly built indexes.
+            shutil.rmtree(os.path.join(home, "noSteam2Steam_Data", "indexes"), ignore_errors=True)
+            env = dict(os.environ, HOME=home, USERPROFILE=home)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, json.dumps(library["sync_folders"])],
+                check=True, capture_output=True, text=True, env=env
+            ).stdout.strip().splitlines()[-1]
+            results[mode] = json.loads(output)
+            for run in results[mode]["passes"]:
+                run["accuracy"] = score(library["games"], run.pop("matches"))
+
+        if args.json:
+            print(json.dumps(results, indent=2))
+            return
+
+        print(f"{'mode':<20}{'pass':<6}{'index s':>9}{'wall s':>9}{'dir reads':>11}{'peak RSS MB':>13}{'accuracy':>10}")
+        for mode, result in results.items():
+            for label, run in zip(("cold", "warm"), result["passes"]):
+                correct = sum(hits for hits, _ in run["accuracy"].values())
+                total = sum(count for _, count in run["accuracy"].values())
+                print(f"{mode:<20}{label:<6}{result['index_s']:>9.2f}{run['wall_s']:>9.2f}{run['dir_reads']:>11}"
+                      f"{result['max_rss_kb'] / 1024:>13.1f}{100 * correct / total:>9.1f}%")
+
+        print(f"\n{'kind':<14}{'phase':<13}" + "".join(f"{mode:>20}" for mode in results))
+        for kind in KINDS:
+            row = f"{kind:<14}{PHASES[kind]:<13}"
+            for result in results.values():
+                hits, count = result["passes"][0]["accuracy"][kind]
+                row += f"{f'{hits}/{count}':>20}"
+            print(row)
+    finally:
+        if not args.keep:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Compares the JSON ludusavi index against the memory-mapped binary index.
+#
+#   python benchmarks/bench_index_format.py [--manifest manifest.yaml] [--lookups 20000]
+#
+# Each format is measured in a fresh interpreter so cold-start time and peak RSS
+# are not polluted by the other one.
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def peak_rss_kb() -> int:
+    # ru_maxrss survives fork+exec on Linux, so prefer the per-process high-water mark.
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_child(index_format: str, index_path: str, keys_path: str) -> None:
+    from identify_game import derive_yaml_views, load_index_from_file
+    from index_store import load_binary_index
+
+    with open(keys_path, 'r', encoding='utf-8') as f:
+        keys = json.load(f)
+
+    start = time.perf_counter()
+    if index_format == "json":
+        yaml_index = load_index_from_file(index_path)
+    else:
+        yaml_index = load_binary_index(index_path)
+    views = derive_yaml_views(yaml_index)
+    loaded = time.perf_counter()
+
+    found = 0
+    for view_name, key in keys:
+        entry = views[view_name].get(key)
+        if entry is not None:
+            found += 1
+            entry["game_name"]
+    looked_up = time.perf_counter()
+
+    # Matched games are the only ones whose files blob is needed.
+    for view_name, key in keys[:100]:
+        entry = views[view_name].get(key)
+        if entry is not None:
+            entry["files"]
+    finished = time.perf_counter()
+
+    print(json.dumps({
+        "load_s": loaded - start,
+        "lookups": len(keys),
+        "found": found,
+        "lookup_s": looked_up - loaded,
+        "files_s": finished - looked_up,
+        "max_rss_kb": peak_rss_kb()
+    }))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the JSON and binary ludusavi index formats.")
+    parser.add_argument("--manifest", help="ludusavi manifest.yaml (defaults to the downloaded one)")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--child", nargs=3, metavar=("FORMAT", "INDEX", "KEYS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    from config import YAML_FILE
+    from identify_game import index_yaml_stream, save_index_to_file
+    from index_store import save_binary_index
+
+    manifest = args.manifest or YAML_FILE
+    start = time.perf_counter()
+    yaml_index = index_yaml_stream(manifest)
+    print(f"Index built from {manifest} in {time.perf_counter() - start:.2f}s")
+
+    random.seed(0)
+    keys = []
+    for view_name in ("by_name", "by_exe", "by_steam_id", "by_path"):
+        view_keys = list(yaml_index[view_name])
+        if view_keys:
+            keys += [(f"yaml_{view_name}", key) for key in random.sample(view_keys, min(len(view_keys), args.lookups // 5))]
+    keys += [("yaml_by_name", f"missing game {i}") for i in range(args.lookups // 5)]
+    random.shuffle(keys)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = {
+            "json": os.path.join(temp_dir, "yaml_index.json"),
+            "binary": os.path.join(temp_dir, "yaml_index.bin")
+        }
+        save_index_to_file(yaml_index, paths["json"])
+        save_binary_index(yaml_index, paths["binary"])
+        keys_path = os.path.join(temp_dir, "keys.json")
+        with open(keys_path, 'w', encoding='utf-8') as f:
+            json.dump(keys, f)
+        del yaml_index
+
+        print(f"{'format':<8}{'size MB':>10}{'load s':>10}{'lookup s':>10}{'files s':>10}{'peak RSS MB':>14}")
+        for index_format, index_path in paths.items():
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", index_format, index_path, keys_path],
+                check=True, capture_output=True, text=True
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(output)
+            print(f"{index_format:<8}{os.path.getsize(index_path) / 2**20:>10.1f}{result['load_s']:>10.3f}"
+                  f"{result['lookup_s']:>10.3f}{result['files_s']:>10.4f}{result['max_rss_kb'] / 1024:>14.1f}")
+
+if __name__ == "__main__":
+    main()
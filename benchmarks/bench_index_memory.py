@@ -0,0 +1,69 @@
+# Reports the memory held by the in-memory ludusavi index, with compact metadata
+# records against the plain dicts they replaced, using tracemalloc.
+#
+#   python benchmarks/bench_index_memory.py [--manifest manifest.yaml]
+#
+# "build" is the index index_yaml_stream returns (what a refresh holds while it
+# writes the binary index); "patch" is the mutable copy a delta update makes of
+# an existing binary index. The dict layout is produced by converting every
+# record back to a dict with its files decoded, as the builder used to keep them.
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def traced_mb() -> float:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0] / 2**20
+
+def as_dicts(index: dict) -> None:
+    index["_metadata"] = [dict(meta) if meta else None for meta in index["_metadata"]]
+
+def measure(label: str, load) -> None:
+    baseline = traced_mb()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    index = load()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20 - baseline
+    compact = traced_mb() - baseline
+    as_dicts(index)
+    plain = traced_mb() - baseline
+    del index
+    print(f"{label:<8}{elapsed:>9.2f}{peak:>10.1f}{compact:>12.1f}{plain:>10.1f}{plain - compact:>10.1f}"
+          f"{100 * (plain - compact) / plain if plain else 0.0:>9.1f}%")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure in-memory index size with tracemalloc.")
+    parser.add_argument("--manifest", help="ludusavi manifest.yaml (defaults to the downloaded one)")
+    args = parser.parse_args()
+
+    from config import YAML_FILE
+    from identify_game import index_yaml_stream
+    from index_store import load_binary_index, save_binary_index
+
+    manifest = args.manifest or YAML_FILE
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index_path = os.path.join(temp_dir, "yaml_index.bin")
+        save_binary_index(index_yaml_stream(manifest), index_path)
+
+        def patch_copy():
+            binary_index = load_binary_index(index_path)
+            try:
+                return binary_index.to_dict()
+            finally:
+                binary_index.close()
+
+        tracemalloc.start()
+        print(f"{'index':<8}{'time s':>9}{'peak MB':>10}{'compact MB':>12}{'dict MB':>10}{'saved MB':>10}{'saved':>10}")
+        measure("build", lambda: index_yaml_stream(manifest))
+        measure("patch", patch_copy)
+        tracemalloc.stop()
+
+if __name__ == "__main__":
+    main()
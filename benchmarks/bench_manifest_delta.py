@@ -0,0 +1,136 @@
+# Times delta updates of the ludusavi index against full rebuilds and checks
+# that every patched index resolves its keys exactly like the rebuilt one.
+#
+#   python benchmarks/bench_manifest_delta.py [--games 20000] [--rounds 5] [--changes 200]
+#
+# The generated manifest shares exe names, install dirs, ids and names between
+# games, so edits keep moving contested keys between owners. Each round edits,
+# removes and adds games, patches the index and compares it with a fresh build;
+# the exit status is 1 if any round differs. Runs with HOME in a temporary
+# directory, so the real manifest state is left alone.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py needs a Steam user to resolve its paths.
+LOGINUSERS_VDF = '"users"\n{\n\t"76561197960287930"\n\t{\n\t\t"AccountName"\t\t"bench"\n\t\t"MostRecent"\t\t"1"\n\t}\n}\n'
+
+def make_game(rng: random.Random, i: int, games: int) -> dict:
+    shared = rng.randrange(max(games // 20, 1))
+    game = {"launch": {f"<base>/bin/game{i}.exe": [{}], f"<base>/shared{shared}.exe": [{}]}}
+    if rng.random() < 0.3:
+        game["installDir"] = {f"Dir {rng.randrange(max(games // 10, 1))}": {}}
+    if rng.random() < 0.4:
+        game["steam"] = {"id": 1000 + rng.randrange(games)}
+    if rng.random() < 0.2:
+        game["gog"] = {"id": 2000000 + rng.randrange(games)}
+    if rng.random() < 0.1:
+        game["alias"] = f"Game {rng.randrange(games)}"
+    return game
+
+def edit_game(rng: random.Random, game: dict, games: int) -> None:
+    field = rng.randrange(4)
+    if field == 0:
+        game["launch"][f"<base>/shared{rng.randrange(max(games // 20, 1))}.exe"] = [{}]
+    elif field == 1:
+        game["alias"] = f"Game {rng.randrange(games)}"
+    elif field == 2:
+        game["installDir"] = {f"Dir {rng.randrange(max(games // 10, 1))}": {}}
+    else:
+        game["steam"] = {"id": 1000 + rng.randrange(games)}
+
+def resolved_keys(index) -> dict:
+    # Each key mapped to the full record of the game owning it.
+    data = index.to_dict()
+    metadata = data["_metadata"]
+    keys = {}
+    for map_name in ("by_exe", "by_path", "by_gog_id", "by_steam_id", "by_name", "by_install_dir"):
+        for key, value in data[map_name].items():
+            if map_name == "by_install_dir":
+                keys[(map_name, key)] = (dict(metadata[value["_meta"]]), value["launch"])
+            else:
+                keys[(map_name, key)] = dict(metadata[value])
+    return keys
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check and time delta updates of the ludusavi index.")
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=200, help="games edited per round")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["HOME"] = os.environ["USERPROFILE"] = home
+        steam_config = os.path.join(home, ".local", "share", "Steam", "config")
+        os.makedirs(steam_config)
+        with open(os.path.join(steam_config, "loginusers.vdf"), 'w', encoding='utf-8') as f:
+            f.write(LOGINUSERS_VDF)
+        import yaml
+        from identify_game import index_yaml_stream, update_yaml_index
+        from index_store import load_binary_index, save_binary_index
+
+        rng = random.Random(args.seed)
+        manifest = os.path.join(home, "manifest.yaml")
+        index_path = os.path.join(home, "yaml_index.bin")
+        rebuilt_path = os.path.join(home, "rebuilt.bin")
+        games = {f"Game {i}": make_game(rng, i, args.games) for i in range(args.games)}
+        next_game = args.games
+
+        def write_manifest() -> None:
+            with open(manifest, 'w', encoding='utf-8') as f:
+                yaml.safe_dump(games, f, sort_keys=False)
+
+        write_manifest()
+        state, _ = update_yaml_index(manifest, index_path)
+        state.save()
+
+        print(f"{'round':<7}{'patch s':>9}{'full s':>9}{'changed':>9}{'keys':>9}  result")
+        failures = 0
+        for round_number in range(1, args.rounds + 1):
+            names = list(games)
+            for name in rng.sample(names, min(args.changes, len(names))):
+                edit_game(rng, games[name], args.games)
+            for name in rng.sample(names, min(args.changes // 10, len(names))):
+                del games[name]
+            for _ in range(args.changes // 10):
+                games[f"Game {next_game}"] = make_game(rng, next_game, args.games)
+                next_game += 1
+            write_manifest()
+
+            start = time.perf_counter()
+            state, changed = update_yaml_index(manifest, index_path)
+            patch_time = time.perf_counter() - start
+            state.save()
+
+            start = time.perf_counter()
+            save_binary_index(index_yaml_stream(manifest), rebuilt_path)
+            full_time = time.perf_counter() - start
+
+            patched, rebuilt = load_binary_index(index_path), load_binary_index(rebuilt_path)
+            patched_keys, rebuilt_keys = resolved_keys(patched), resolved_keys(rebuilt)
+            trigrams_equal = list(patched.view("by_name_trigram")) == list(rebuilt.view("by_name_trigram"))
+            patched.close()
+            rebuilt.close()
+
+            differing = [key for key in patched_keys.keys() | rebuilt_keys.keys()
+                         if patched_keys.get(key) != rebuilt_keys.get(key)]
+            if differing or not trigrams_equal or changed is None:
+                failures += 1
+                result = ("full rebuild" if changed is None
+                          else f"{len(differing)} keys differ, e.g. {sorted(differing)[:3]}" if differing
+                          else "trigram keys differ")
+            else:
+                result = "equal"
+            print(f"{round_number:<7}{patch_time:>9.2f}{full_time:>9.2f}"
+                  f"{len(changed) if changed is not None else '-':>9}{len(rebuilt_keys):>9}  {result}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
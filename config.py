@@ -1,8 +1,12 @@
 import os
 from pathlib import Path
 import binascii
+import platform
 import re
+import subprocess
 import sys
+import threading
+import time
 import vdf
 import logging
 
@@ -52,6 +56,39 @@ STEAM_ID_MAPPING_FILE = str(os.path.join(SCRIPT_DIR, "steam_id_mapping.json"))
 XML_FILE = os.path.join(SCRIPT_DIR, "GBM_Official.xml")
 YAML_FILE = os.path.join(SCRIPT_DIR, "manifest.yaml")
 INDEX_DIR = os.path.join(SCRIPT_DIR, "indexes")
+SCAN_CACHE_FILE = os.path.join(INDEX_DIR, "scan_cache.json")
+FINGERPRINT_FILE = os.path.join(INDEX_DIR, "exe_fingerprints.json")
+MANIFEST_STATE_FILE = os.path.join(INDEX_DIR, "manifest_state.json")
+LUTRIS_CACHE_FILE = os.path.join(INDEX_DIR, "lutris_cache.db")
+# Lutris responses are served from the cache for LUTRIS_CACHE_TTL seconds (404s
+# and empty searches for LUTRIS_NEGATIVE_CACHE_TTL), then revalidated; entries
+# not refreshed within LUTRIS_CACHE_MAX_AGE are dropped.
+LUTRIS_CACHE_TTL = 30 * 24 * 3600
+LUTRIS_NEGATIVE_CACHE_TTL = 3 * 24 * 3600
+LUTRIS_CACHE_MAX_AGE = 180 * 24 * 3600
+# games.json entries Lutris answered for (found, partly filled or not found)
+# within LUTRIS_REFRESH_AGE seconds are not looked up again.
+LUTRIS_REFRESH_AGE = 30 * 24 * 3600
+# Above this many changed manifest games the index is rebuilt instead of patched.
+MANIFEST_DELTA_MAX_CHANGES = 5000
+SYSTEM_PROFILE_FILE = os.path.join(SCRIPT_DIR, "system_profile.json")
+SYSTEM_PROFILE_TTL = 7 * 24 * 3600
+FUZZY_MATCH_CUTOFF = 0.5
+DIRECTORY_CACHE_MAX_ENTRIES = 50000
+PLATFORM_SCAN_BYTES = 1024 * 1024
+# Per root folder: entries read and seconds spent walking before identification
+# settles for what it has found so far.
+FOLDER_SCAN_MAX_ENTRIES = 200000
+FOLDER_SCAN_TIME_BUDGET = 20.0
+# Concurrent scan tasks per storage device. Devices listed here (any path on
+# them -> limit) keep a fixed limit; the rest start at the default and are
+# tuned from observed throughput up to the max.
+DEVICE_IO_LIMITS = {}
+DEVICE_IO_DEFAULT_LIMIT = 4
+DEVICE_IO_MAX_LIMIT = 16
+
+DOWNLOAD_TIMEOUT = 30  # Seconds to connect / between bytes; not the whole download
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 XML_URL = "https://github.com/MikeMaximus/gbm-web/blob/gh-pages/GBM_Official.xml?raw=true"
 YAML_URL = "https://raw.githubusercontent.com/mtkennerly/ludusavi-manifest/refs/heads/master/data/manifest.yaml"
 
@@ -119,6 +156,20 @@ HEROIC_PATHS = [
         os.path.join(Path.home(), "Library", "Application Support", "heroic", "gamesConfig.json")  # macOS
     ]
 
+HEROIC_CONFIG_DIRS = list(dict.fromkeys(
+    [os.path.dirname(path) for path in HEROIC_PATHS if os.path.isabs(path)]
+    + [os.path.join(Path.home(), ".var", "app", "com.heroicgameslauncher.hgl", "config", "heroic")]
+))
+
+LUTRIS_DATA_DIRS = [
+    os.path.join(Path.home(), ".local", "share", "lutris"),
+    os.path.join(Path.home(), ".var", "app", "net.lutris.Lutris", "data", "lutris")  # Flatpak
+    ]
+LUTRIS_CONFIG_DIRS = [
+    os.path.join(Path.home(), ".config", "lutris"),
+    os.path.join(Path.home(), ".var", "app", "net.lutris.Lutris", "config", "lutris")  # Flatpak
+    ] + LUTRIS_DATA_DIRS  # Newer Lutris keeps games/*.yml next to pga.db
+
 GOG_PATHS = [
     os.path.join(os.getenv("PROGRAMFILES", ""), "GOG Galaxy", "Games"),  # Windows
     os.path.join(os.getenv("LOCALAPPDATA", ""), "GOG.com", "Galaxy", "Configuration", "config.json")  # Windows config
@@ -273,8 +324,95 @@ def get_latest_proton(get_path=False):
         return None
     
 def get_proton_version(get_path=False):
-    version = get_latest_proton_ge(get_path)
-    if not version:
-        version = get_latest_proton(get_path)
-    return version
+    proton = get_system_profile()["proton"]
+    return proton["path"] if get_path else proton["name"]
+
+# System profile
+SYSTEM_PROFILE_VERSION = 1
+STEAMOS_MARKERS = ["/usr/share/steamos", "/home/deck"]
+VULKAN_ICD_DIR = "/usr/share/vulkan/icd.d"
+
+_system_profile = None
+_system_profile_lock = threading.Lock()
+
+def is_64bit_system():
+    return sys.maxsize > 2**32
 
+def supports_vulkan():
+    try:
+        result = subprocess.run(["vulkaninfo"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=15)
+        return result.returncode == 0
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        try:
+            return os.path.exists(VULKAN_ICD_DIR) and len(os.listdir(VULKAN_ICD_DIR)) > 0
+        except Exception:
+            return False
+
+def is_steamos():
+    try:
+        return any(os.path.exists(marker) for marker in STEAMOS_MARKERS)
+    except Exception as e:
+        logger.error(f"Error checking specific files: {e}")
+        return False
+
+def _proton_dirs_signature():
+    signature = {}
+    for proton_dir in PROTON_DIRS + PROTON_GE_DIRS:
+        try:
+            signature[proton_dir] = os.stat(proton_dir).st_mtime_ns
+        except OSError:
+            signature[proton_dir] = None
+    return signature
+
+def _detect_proton():
+    name = get_latest_proton_ge() or get_latest_proton()
+    path = get_latest_proton_ge(True) or get_latest_proton(True)
+    return {"name": name, "path": path}
+
+def _load_system_profile():
+    # utils imports config, so it is only imported once config is loaded.
+    from utils import load_json_file
+    profile = load_json_file(SYSTEM_PROFILE_FILE, "system profile", SYSTEM_PROFILE_VERSION)
+    if profile is None:
+        return None
+    if time.time() - profile.get("created", 0) > SYSTEM_PROFILE_TTL:
+        return None
+    return profile
+
+def _save_system_profile(profile):
+    from utils import save_json_file
+    save_json_file(profile, SYSTEM_PROFILE_FILE, "system profile", indent=2)
+
+def get_system_profile(refresh=False):
+    # Probed once per process and persisted for SYSTEM_PROFILE_TTL; Proton versions
+    # are rescanned whenever one of the Proton directories changes.
+    global _system_profile
+    with _system_profile_lock:
+        if _system_profile is not None and not refresh:
+            return _system_profile
+
+        profile = None if refresh else _load_system_profile()
+        proton_dirs = _proton_dirs_signature()
+
+        if profile is None:
+            profile = {
+                "version": SYSTEM_PROFILE_VERSION,
+                "created": time.time(),
+                "vulkan": supports_vulkan(),
+                "steamos": is_steamos(),
+                "proton": _detect_proton(),
+                "proton_dirs": proton_dirs
+            }
+            logger.info(f"System profile: Vulkan {profile['vulkan']}, SteamOS {profile['steamos']}, "
+                        f"Proton {profile['proton']['name']}")
+            _save_system_profile(profile)
+        elif profile.get("proton_dirs") != proton_dirs:
+            profile["proton"] = _detect_proton()
+            profile["proton_dirs"] = proton_dirs
+            _save_system_profile(profile)
+
+        # Cheap to query and never worth trusting from disk.
+        profile["is_64bit"] = is_64bit_system()
+        profile["os"] = platform.system().lower()
+        _system_profile = profile
+        return profile
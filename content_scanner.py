@@ -0,0 +1,44 @@
+import re
+from typing import Optional, Tuple
+
+SCAN_CHUNK_SIZE = 64 * 1024
+# Bytes carried over from the previous chunk so an id split across two reads is
+# still found; a match cut off at the end of a chunk is carried over whole.
+SCAN_OVERLAP = 256
+
+# Every appid/GOG id pattern in one alternation, so each chunk is scanned once.
+# The group that matched names the kind of id found.
+PLATFORM_ID_PATTERN = re.compile(rb"""
+      \#\s*appid\s*[\r\n]+\s*id\s*=\s*(?P<steam_section>\d{3,})
+    | "appid"\s*:\s*"?(?P<steam_json>\d{3,})
+    | appid\s*=\s*(?P<steam>\d{3,})
+    | (?<![a-z0-9_])gog_?(?:game_?)?id"?\s*[=:]\s*"?(?P<gog>\d{6,})
+""", re.IGNORECASE | re.VERBOSE)
+
+STEAM_KINDS = ("steam_section", "steam_json", "steam")
+
+def scan_platform_ids(file_path: str, byte_budget: int) -> Tuple[Optional[Tuple[str, str]], int]:
+    # Returns ((kind, id) or None, bytes read). Reading stops at the first hit
+    # or once byte_budget bytes of the file have been scanned.
+    scanned = 0
+    tail = b""
+    with open(file_path, 'rb') as f:
+        while True:
+            requested = min(SCAN_CHUNK_SIZE, byte_budget - scanned)
+            chunk = f.read(requested) if requested > 0 else b""
+            scanned += len(chunk)
+            final = len(chunk) < requested or scanned >= byte_budget
+            buffer = tail + chunk
+            carry_from = max(0, len(buffer) - SCAN_OVERLAP)
+
+            for match in PLATFORM_ID_PATTERN.finditer(buffer):
+                if match.end() == len(buffer) and not final:
+                    # The digits may continue in the next chunk.
+                    carry_from = min(carry_from, match.start())
+                    break
+                kind = match.lastgroup
+                return (kind, match.group(kind).decode("ascii")), scanned
+
+            if final:
+                return None, scanned
+            tail = buffer[carry_from:]
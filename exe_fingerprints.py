@@ -0,0 +1,171 @@
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from config import FINGERPRINT_FILE
+from manifest_delta import changed_games_since
+from utils import load_json_file, save_json_file
+
+FINGERPRINT_BLOCK = 64 * 1024
+
+def exe_fingerprint(file_path: str, size: int) -> str:
+    # Size plus the first and last blocks: enough to tell game executables apart
+    # without reading the whole file.
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BLOCK))
+        if size > FINGERPRINT_BLOCK:
+            f.seek(max(FINGERPRINT_BLOCK, size - FINGERPRINT_BLOCK))
+            digest.update(f.read(FINGERPRINT_BLOCK))
+    return f"{size}:{digest.hexdigest()}"
+
+# Maps exe fingerprints to the identification result of the folder they were
+# chosen in, so a renamed or moved folder is recognised from its exe alone.
+# Fingerprints seen with two different games (engine templates, stub launchers)
+# are marked ambiguous and never used. Each entry keeps the index signature it
+# was resolved under and is dropped once the index changes its game.
+class FingerprintStore:
+    VERSION = 2
+
+    def __init__(self, store_file: str = FINGERPRINT_FILE, index_signature: str = "",
+                 index_changes: Optional[List[Dict[str, Any]]] = None):
+        self.store_file = store_file
+        self.index_signature = index_signature
+        self.index_changes = index_changes or []
+        self.lock = threading.Lock()
+        self.fingerprints: Dict[str, Dict[str, Any]] = {}
+        self.paths: Dict[str, list] = {}
+        self._load()
+        self._names = self._build_names()
+        self.hits = 0
+        self.dirty = False
+
+    def _load(self) -> None:
+        data = load_json_file(self.store_file, "fingerprint store", self.VERSION)
+        if data is None:
+            return
+        self.fingerprints = data.get("fingerprints", {})
+        self.paths = data.get("paths", {})
+
+    def _build_names(self) -> Dict[str, Set[str]]:
+        names: Dict[str, Set[str]] = {}
+        for fingerprint, entry in self.fingerprints.items():
+            if not entry.get("ambiguous"):
+                names.setdefault(os.path.basename(entry["exe"]).lower(), set()).add(fingerprint)
+        return names
+
+    def _is_current(self, entry: Dict[str, Any]) -> bool:
+        # User selections are the user's answer, not an index lookup, so they stay.
+        if entry.get("user_selected") or entry.get("index") == self.index_signature:
+            return True
+        changed = changed_games_since(self.index_changes, entry.get("index"), self.index_signature)
+        if changed is None or entry["match"].get("game_name") in changed:
+            return False
+        entry["index"] = self.index_signature
+        self.dirty = True
+        return True
+
+    def _fingerprint(self, exe_path: str) -> Optional[str]:
+        exe_path = os.path.normpath(exe_path)
+        try:
+            stat = os.stat(exe_path)
+        except OSError:
+            return None
+        if not stat.st_size:
+            return None
+
+        with self.lock:
+            known = self.paths.get(exe_path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+
+        try:
+            fingerprint = exe_fingerprint(exe_path, stat.st_size)
+        except OSError:
+            return None
+        with self.lock:
+            self.paths[exe_path] = [stat.st_size, stat.st_mtime_ns, fingerprint]
+            self.dirty = True
+        return fingerprint
+
+    def lookup(self, exes: Iterable[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+        # Only exes whose name was recorded before get stat'ed and hashed.
+        for exe_path, _ in exes:
+            with self.lock:
+                candidates = self._names.get(os.path.basename(exe_path).lower())
+            if not candidates:
+                continue
+            fingerprint = self._fingerprint(exe_path)
+            if fingerprint is None or fingerprint not in candidates:
+                continue
+            with self.lock:
+                entry = self.fingerprints.get(fingerprint)
+                if entry is None or entry.get("ambiguous") or not self._is_current(entry):
+                    continue
+                self.hits += 1
+            match = dict(entry["match"])
+            match["exe_path"] = exe_path
+            return match
+        return None
+
+    def record(self, root_folder_path: str, match: Dict[str, Any], user_selected: bool = False) -> None:
+        exe_path = match.get("exe_path")
+        if not exe_path:
+            return
+        exe_path = os.path.normpath(exe_path)
+        rel_exe = os.path.relpath(exe_path, root_folder_path)
+        if rel_exe.startswith(os.pardir):
+            return
+        fingerprint = self._fingerprint(exe_path)
+        if fingerprint is None:
+            return
+
+        with self.lock:
+            entry = self.fingerprints.get(fingerprint)
+            if entry is not None and entry.get("ambiguous"):
+                return
+            if entry is not None and not self._is_current(entry):
+                entry = None
+            if entry is not None and entry["match"].get("game_name") != match.get("game_name"):
+                if user_selected == bool(entry.get("user_selected")):
+                    # Two games share this exe, so it identifies neither of them.
+                    self.fingerprints[fingerprint] = {"exe": entry["exe"], "ambiguous": True}
+                    self._names.get(os.path.basename(entry["exe"]).lower(), set()).discard(fingerprint)
+                    self.dirty = True
+                    return
+                if not user_selected:
+                    # The user picked something else for this exe; keep their choice.
+                    return
+            elif entry is not None and (entry.get("user_selected") or not user_selected):
+                return
+
+            self.fingerprints[fingerprint] = {"match": match, "exe": rel_exe, "user_selected": user_selected,
+                                              "index": self.index_signature}
+            self._names.setdefault(os.path.basename(rel_exe).lower(), set()).add(fingerprint)
+            self.dirty = True
+
+    def is_recorded(self, exe_path: str, user_selected: bool = False) -> bool:
+        with self.lock:
+            known = self.paths.get(os.path.normpath(exe_path))
+            entry = self.fingerprints.get(known[2]) if known else None
+            if entry is None:
+                return False
+            return not user_selected or entry.get("ambiguous") or bool(entry.get("user_selected"))
+
+    def prune_paths(self) -> None:
+        # Fingerprints outlive their folders on purpose; only the path shortcuts go.
+        with self.lock:
+            stale = [path for path in self.paths if not os.path.exists(path)]
+            for path in stale:
+                del self.paths[path]
+            if stale:
+                self.dirty = True
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"version": self.VERSION, "fingerprints": self.fingerprints, "paths": self.paths}
+            if save_json_file(data, self.store_file, "fingerprint store"):
+                self.dirty = False
@@ -41,6 +41,9 @@ class GameDataManager:
         for field in simple_fields:
             if field in new and (field not in merged or not merged[field]):
                 merged[field] = new[field]
+
+        if new.get('lutris_updated', 0) > merged.get('lutris_updated', 0):
+            merged['lutris_updated'] = new['lutris_updated']
         
         if 'platforms' in new:
             existing_platforms = set(existing.get('platforms', []))
@@ -94,11 +97,11 @@ def main():
     associate_data = run_identification()
     
     logger.info("Enhancing data with Lutris information...")
-    enhancer = LutrisDataEnhancer(associate_data)
+    manager = GameDataManager()
+    enhancer = LutrisDataEnhancer(associate_data, existing_data=manager.data)
     enhanced_data = enhancer.enhance_with_lutris_data()
     
     logger.info("Updating database...")
-    manager = GameDataManager()
     manager.update_data(enhanced_data)
     manager.save_data()
     
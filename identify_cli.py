@@ -0,0 +1,93 @@
+# identify_cli.py
+# Non-interactive game identification: no zenity, results and per-phase
+# timings/counts as JSON on stdout (or --output), logs on stderr.
+#
+#   python identify_cli.py [--sync-folder DIR ...] [--max-depth N] [--workers N]
+#                          [--lutris] [--lutris-workers N] [--refresh-lutris] [--save] [--output FILE]
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from identify_game import get_sync_folders, identify_sync_folders, verify_and_download_files, wait_for_index_refresh
+from config import XML_FILE, YAML_FILE
+
+logger = logging.getLogger("no_steam_to_steam.log")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Identify games in the sync folders and print the matches as JSON.")
+    parser.add_argument("--sync-folder", action="append", dest="sync_folders", metavar="DIR",
+                        help="folder to scan (repeatable; defaults to the configured sync folders)")
+    parser.add_argument("--max-depth", type=int, default=8, help="deepest level walked inside each game folder")
+    parser.add_argument("--workers", type=int, help="identification worker threads (default: per-device scheduler)")
+    parser.add_argument("--lutris", action="store_true", help="enrich the matches with Lutris data")
+    parser.add_argument("--lutris-workers", type=int, help="concurrent Lutris lookups")
+    parser.add_argument("--refresh-lutris", action="store_true",
+                        help="look up every game again, even those already enriched in games.json")
+    parser.add_argument("--save", action="store_true", help="merge the (enriched) matches into games.json")
+    parser.add_argument("--wait-refresh", action="store_true",
+                        help="wait for a background manifest refresh before exiting")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    start_time = time.perf_counter()
+
+    phase_start = time.perf_counter()
+    indexes = verify_and_download_files()
+    index_time = time.perf_counter() - phase_start
+
+    report: Dict[str, Any] = {}
+    matches = identify_sync_folders(args.sync_folders or get_sync_folders(), XML_FILE, YAML_FILE, indexes,
+                                    args.max_depth, args.workers, report=report)
+    report['timings'] = {'indexes': index_time, **report.get('timings', {})}
+
+    if args.lutris or args.save:
+        from game_data_manager import GameDataManager
+        from lutris_search_enhancement import LutrisDataEnhancer
+
+        phase_start = time.perf_counter()
+        manager = GameDataManager()
+        enhancer = LutrisDataEnhancer(matches, existing_data=None if args.refresh_lutris else manager.data)
+        enhanced = enhancer.enhance_with_lutris_data(args.lutris_workers)
+        report['timings']['lutris'] = time.perf_counter() - phase_start
+        report['counts']['lutris_enriched'] = sum(1 for data in enhanced.values() if data.get('source') == "Lutris")
+        report['counts'].update({f'lutris_{key}': value for key, value in enhancer.stats.items()})
+        report['lutris_resolved_by'] = enhancer.resolved_by
+        report['enhanced'] = enhanced
+
+        if args.save:
+            phase_start = time.perf_counter()
+            manager.update_data(enhanced)
+            manager.save_data()
+            report['timings']['save'] = time.perf_counter() - phase_start
+
+    if args.wait_refresh:
+        phase_start = time.perf_counter()
+        wait_for_index_refresh()
+        report['timings']['index_refresh_wait'] = time.perf_counter() - phase_start
+
+    report['timings']['total'] = time.perf_counter() - start_time
+    report['matches'] = matches
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        report = run(args)
+    except Exception as e:
+        logger.error(f"Identification failed: {str(e)}")
+        return 1
+
+    output = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,79 +1,99 @@
 #identify_game.py
-from collections import deque
+from collections import OrderedDict
 import logging
 import os
 import xml.etree.ElementTree as ET
 import yaml
 from yaml import CSafeLoader as SafeLoader
-import io
+from yaml.constructor import SafeConstructor
+from yaml.cyaml import CParser
+from yaml.events import (AliasEvent, MappingEndEvent, MappingStartEvent, ScalarEvent,
+                         SequenceEndEvent, SequenceStartEvent, StreamEndEvent)
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
 import requests
-import subprocess
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import sys
 import json
 import re
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-import platform
+import threading
 import time
-from typing import Dict, List, Optional, Set, Any
-
-from config import DEFAULT_GAMES_INFO_PATH, GOG_PATHS, HEROIC_PATHS, DEFAULT_SYNC_FOLDER, IGNORED_FILES, IGNORED_DIRS, SCRIPT_DIR, XML_FILE, YAML_FILE, XML_URL, YAML_URL, SYNC_FOLDERS_FILE, INDEX_DIR
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Any
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from config import DEFAULT_GAMES_INFO_PATH, GOG_PATHS, HEROIC_PATHS, DEFAULT_SYNC_FOLDER, IGNORED_FILES, IGNORED_DIRS, SCRIPT_DIR, XML_FILE, YAML_FILE, XML_URL, YAML_URL, SYNC_FOLDERS_FILE, INDEX_DIR, FUZZY_MATCH_CUTOFF, DIRECTORY_CACHE_MAX_ENTRIES, PLATFORM_SCAN_BYTES, FOLDER_SCAN_MAX_ENTRIES, FOLDER_SCAN_TIME_BUDGET, DOWNLOAD_TIMEOUT, MANIFEST_DELTA_MAX_CHANGES, DOWNLOAD_CHUNK_SIZE, get_system_profile
+from index_store import BinaryIndex, MetadataRecord, is_current_binary_index, load_binary_index, patch_binary_index, save_binary_index
+from content_scanner import STEAM_KINDS, scan_platform_ids
+from exe_fingerprints import FingerprintStore
+from io_scheduler import get_io_scheduler
+from launcher_importers import LauncherRecord, load_launcher_records
+from manifest_delta import ManifestState, iter_manifest_sections, load_index_changes
+from path_resolver import get_path_resolver
+from scan_cache import ScanCache
+from trigram_index import TrigramIndex, build_name_weights, build_trigram_postings, sorted_names
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("no_steam_to_steam.log")
 
+PLATFORM_FILE_EXTENSIONS = ('.ini', '.txt', '.cfg', '.json')
+STR_TAG = 'tag:yaml.org,2002:str'
+
 def download_file(url, destination):
+    # Conditional GET: the server answers 304 when our copy is current. The
+    # body is streamed to a temp file and renamed, so readers of destination
+    # only ever see a complete file.
+    headers = {}
+    etag_file = destination + ".etag"
+    if os.path.exists(destination):
+        if os.path.exists(etag_file):
+            with open(etag_file, "r") as f:
+                headers["If-None-Match"] = f.read().strip()
+        headers["If-Modified-Since"] = formatdate(os.path.getmtime(destination), usegmt=True)
+
+    temp_path = destination + ".tmp"
     try:
-        response = requests.head(url, allow_redirects=True)
-        response.raise_for_status()
-
-        remote_last_modified = response.headers.get("Last-Modified")
-        remote_etag = response.headers.get("ETag")
-
-        if os.path.exists(destination):
+        with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status_code == 304:
+                logger.info(f"File {destination} has not changed.")
+                return False
+            response.raise_for_status()
+
+            with open(temp_path, "wb") as file:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    file.write(chunk)
+            os.replace(temp_path, destination)
+
+            remote_last_modified = response.headers.get("Last-Modified")
             if remote_last_modified:
-                local_last_modified = time.ctime(os.path.getmtime(destination))
-                if remote_last_modified <= local_last_modified:
-                    logger.info(f"File {destination} has not changed (Last-Modified).")
-                    return False
-            if remote_etag:
-                etag_file = destination + ".etag"
-                if os.path.exists(etag_file):
-                    with open(etag_file, "r") as f:
-                        local_etag = f.read().strip()
-                        if remote_etag == local_etag:
-                            logger.info(f"File {destination} has not changed (ETag).")
-                            return False
-
-        response = requests.get(url)
-        response.raise_for_status()
-        with open(destination, "wb") as file:
-            file.write(response.content)
-        logger.info(f"File downloaded and saved to: {destination}")
+                # Keep the server's timestamp so If-Modified-Since echoes it back.
+                try:
+                    remote_mtime = parsedate_to_datetime(remote_last_modified).timestamp()
+                    os.utime(destination, (remote_mtime, remote_mtime))
+                except (TypeError, ValueError, OverflowError):
+                    pass
 
-        if remote_etag:
-            with open(destination + ".etag", "w") as f:
-                f.write(remote_etag)
+            remote_etag = response.headers.get("ETag")
+            if remote_etag:
+                with open(etag_file, "w") as f:
+                    f.write(remote_etag)
+            elif os.path.exists(etag_file):
+                os.remove(etag_file)
 
+        logger.info(f"File downloaded and saved to: {destination}")
         return True
-    except requests.RequestException as e:
+    except (requests.RequestException, OSError) as e:
         logger.error(f"Error downloading file: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
         return False
 
-def load_yaml_file(file_path):
-    try:
-        with open(file_path, 'rb') as f:
-            data = f.read()
-            
-            try:
-                return yaml.load(io.BytesIO(data), Loader=SafeLoader)
-            except:
-                return yaml.safe_load(data.decode('utf-8'))
-                
-    except Exception as e:
-        logger.error(f"Error loading YAML: {str(e)[:200]}")
-        return None
-
 def index_xml_data(root):
     xml_index = {}
     for game in root.findall('Game'):
@@ -86,112 +106,438 @@ def index_xml_data(root):
 def normalize_path(path):
     return os.path.normpath(path).replace("\\", "/").lower()
 
-def is_64bit_system():
-    return sys.maxsize > 2**32
-
-def index_yaml_data(yaml_data: Dict) -> Dict:
-    index = {
-        "_metadata": [],  
-        "by_exe": {},
-        "by_path": {},
-        "by_install_dir": {},
-        "by_gog_id": {},
-        "by_steam_id": {},
-        "by_name": {}, 
-        "by_name_fuzzy": {} 
-    }
-    
-    index["_metadata"] = [None] * len(yaml_data)
-    
-    for yaml_game_name, yaml_game_data in yaml_data.items():
-        metadata = {
-            "game_name": yaml_game_name,
-            "steam_id": yaml_game_data.get("steam", {}).get("id"),
-            "lutris_id": yaml_game_data.get("id", {}).get("lutris"),
-            "gog_id": yaml_game_data.get("gog", {}).get("id"),
-            "alias": yaml_game_data.get("alias"),
-            "files": yaml_game_data.get("files", {})
+# Key maps whose values are metadata indexes; by_install_dir also keeps the launch data.
+INDEX_KEY_MAPS = ("by_exe", "by_path", "by_gog_id", "by_steam_id", "by_name")
+
+def yaml_game_keys(yaml_game_name: str, yaml_game_data: Dict) -> List[Tuple[str, str]]:
+    # Every (map, key) a manifest game claims in the index.
+    keys = [("by_name", yaml_game_name.lower())]
+    alias = yaml_game_data.get("alias")
+    if alias:
+        for name in ([alias] if isinstance(alias, str) else alias):
+            keys.append(("by_name", name.lower()))
+
+    steam_id = yaml_game_data.get("steam", {}).get("id")
+    if steam_id:
+        keys.append(("by_steam_id", str(steam_id)))
+    gog_id = yaml_game_data.get("gog", {}).get("id")
+    if gog_id:
+        keys.append(("by_gog_id", str(gog_id)))
+
+    if "installDir" in yaml_game_data:
+        install_dir = (yaml_game_data["installDir"].lower()
+                    if isinstance(yaml_game_data["installDir"], str)
+                    else next(iter(yaml_game_data["installDir"].keys()), "").lower())
+        keys.append(("by_install_dir", install_dir))
+
+    for launch_path in yaml_game_data.get("launch", {}):
+        if launch_path.startswith("<base>/"):
+            keys.append(("by_path", launch_path[7:].lower()))
+        exe_name = os.path.basename(launch_path).lower()
+        if exe_name:
+            keys.append(("by_exe", exe_name))
+    return keys
+
+class YamlIndexBuilder:
+    # Metadata indexes are assigned relative to the first game and shifted in
+    # finish(), which keeps the index layout without knowing the game count upfront.
+    # Given an existing binary index, the builder only collects what changes in
+    # it and patch() splices that into its sections.
+    # A key claimed by several games belongs to the last of them in manifest
+    # order; shared, when given, collects those claimants per map and key.
+    def __init__(self, base: Optional[BinaryIndex] = None, shared: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self.index = {
+            "_metadata": [],  
+            "by_exe": {},
+            "by_path": {},
+            "by_install_dir": {},
+            "by_gog_id": {},
+            "by_steam_id": {},
+            "by_name": {}, 
+            "by_name_trigram": {} 
         }
-        
-        metadata_str = json.dumps(metadata, sort_keys=True)
-        if metadata_str not in getattr(index_yaml_data, '_cache', {}):
-            if not hasattr(index_yaml_data, '_cache'):
-                index_yaml_data._cache = {}
-            meta_idx = len(index["_metadata"])
-            index["_metadata"].append(metadata)
-            index_yaml_data._cache[metadata_str] = meta_idx
-        else:
-            meta_idx = index_yaml_data._cache[metadata_str]
+        self.base = base
+        # Keys and metadata of the base index dropped by remove_games().
+        self.removed_keys: Dict[str, Set[str]] = {}
+        self.removed_metadata: Set[int] = set()
+        self._base_games: Optional[Dict[Any, List[int]]] = None
+        self.shared = shared
+        # Settled owner of every key a patch touches; see settle_owners().
+        self.owners: Dict[Tuple[str, str], Optional[str]] = {}
+        self.games = 0
+        self._metadata_buckets = {}
+
+    def _metadata_index(self, metadata: MetadataRecord) -> int:
+        # Cheap structural hash: scalar fields pick the bucket, full equality
+        # (files compared as their serialized blob) only runs on collisions.
+        alias = metadata.alias
+        bucket_key = (
+            metadata.game_name, metadata.steam_id, metadata.lutris_id, metadata.gog_id,
+            tuple(alias) if isinstance(alias, list) else alias
+        )
+        try:
+            bucket = self._metadata_buckets.setdefault(bucket_key, [])
+        except TypeError:
+            bucket = self._metadata_buckets.setdefault(repr(bucket_key), [])
+
+        for meta_idx in bucket:
+            if self.index["_metadata"][meta_idx] == metadata:
+                return meta_idx
+
+        meta_idx = len(self.index["_metadata"])
+        self.index["_metadata"].append(metadata)
+        bucket.append(meta_idx)
+        return meta_idx
+
+    def add_game(self, yaml_game_name: str, yaml_game_data: Dict) -> None:
+        index = self.index
+        self.games += 1
+        metadata = MetadataRecord.from_fields(
+            yaml_game_name,
+            yaml_game_data.get("steam", {}).get("id"),
+            yaml_game_data.get("id", {}).get("lutris"),
+            yaml_game_data.get("gog", {}).get("id"),
+            yaml_game_data.get("alias"),
+            yaml_game_data.get("files", {})
+        )
+        meta_idx = self._metadata_index(metadata)
 
-        normalized_name = yaml_game_name.lower()
-        index["by_name"][normalized_name] = meta_idx
-        
-        name_parts = set(normalized_name.split())
-        for part in name_parts:
-            if len(part) > 2: 
-                if part not in index["by_name_fuzzy"]:
-                    index["by_name_fuzzy"][part] = []
-                index["by_name_fuzzy"][part].append(meta_idx)
-        
-        if metadata["alias"]:
-            if isinstance(metadata["alias"], str):
-                aliases = [metadata["alias"]]
+        for map_name, key in yaml_game_keys(yaml_game_name, yaml_game_data):
+            if self.owners.get((map_name, key), yaml_game_name) != yaml_game_name:
+                continue
+            if self.shared is not None:
+                owner = self._owner(map_name, key)
+                if owner is not None and owner != yaml_game_name:
+                    self.shared.setdefault(map_name, {}).setdefault(key, [owner]).append(yaml_game_name)
+            if map_name == "by_install_dir":
+                index[map_name][key] = {"_meta": meta_idx, "launch": yaml_game_data.get("launch", {})}
             else:
-                aliases = metadata["alias"]
-            
-            for alias in aliases:
-                normalized_alias = alias.lower()
-                index["by_name"][normalized_alias] = meta_idx
-                alias_parts = set(normalized_alias.split())
-                for part in alias_parts:
-                    if len(part) > 2:
-                        if part not in index["by_name_fuzzy"]:
-                            index["by_name_fuzzy"][part] = []
-                        index["by_name_fuzzy"][part].append(meta_idx)
-
-        if metadata["steam_id"]:
-            index["by_steam_id"][str(metadata["steam_id"])] = meta_idx
-            
-        if metadata["gog_id"]:
-            index["by_gog_id"][str(metadata["gog_id"])] = meta_idx
-
-        if "installDir" in yaml_game_data:
-            install_dir = (yaml_game_data["installDir"].lower() 
-                        if isinstance(yaml_game_data["installDir"], str) 
-                        else next(iter(yaml_game_data["installDir"].keys()), "").lower())
-            index["by_install_dir"][install_dir] = {
-                "_meta": meta_idx,
-                "launch": yaml_game_data.get("launch", {})
+                index[map_name][key] = meta_idx
+
+    def _owner(self, map_name: str, key: str) -> Optional[str]:
+        value = self.index[map_name].get(key)
+        if value is not None:
+            return self.index["_metadata"][value["_meta"] if map_name == "by_install_dir" else value].game_name
+        if self.base is None or key in self.removed_keys.get(map_name, ()):
+            return None
+        view = self.base.view(map_name)
+        position = view._find(key)
+        return self.base.metadata(view._values[position])["game_name"] if position >= 0 else None
+
+    def _keys_of(self, game_names: Set[str]) -> Iterator[Tuple[str, str]]:
+        # Every (map, key) currently held by one of the games.
+        stale = {meta_idx for meta_idx, meta in enumerate(self.index["_metadata"])
+                 if meta and meta.game_name in game_names}
+        base_stale = self._base_metadata(game_names)
+        for map_name in INDEX_KEY_MAPS + ("by_install_dir",):
+            for key, value in self.index[map_name].items():
+                if (value["_meta"] if map_name == "by_install_dir" else value) in stale:
+                    yield map_name, key
+            if base_stale:
+                view = self.base.view(map_name)
+                removed = self.removed_keys.get(map_name, ())
+                for position in view.positions_of(base_stale):
+                    key = view.key_at(position)
+                    if key not in removed and key not in self.index[map_name]:
+                        yield map_name, key
+
+    def _base_metadata(self, game_names: Set[str]) -> Set[int]:
+        if self.base is None:
+            return set()
+        if self._base_games is None:
+            self._base_games = self.base.metadata_by_game()
+        return {meta_idx for name in game_names for meta_idx in self._base_games.get(name, ())
+                if meta_idx not in self.removed_metadata}
+
+    def settle_owners(self, shared: Dict[str, Dict[str, List[str]]], stale_games: Set[str],
+                      claims: Dict[str, List[Tuple[str, str]]], order: Dict[str, int]) -> Set[str]:
+        # Decides, as a full build would, who owns every key that a stale game
+        # held or shared and every key claimed by the games about to be added
+        # (name -> yaml_game_keys). Keeps shared up to date and returns the other
+        # games that gained or lost a key; they have to be re-added as well.
+        wanted: Dict[Tuple[str, str], Set[str]] = {}
+        for yaml_game_name, keys in claims.items():
+            for index_key in keys:
+                wanted.setdefault(index_key, set()).add(yaml_game_name)
+        touched = set(wanted)
+        touched.update(self._keys_of(stale_games))
+        for map_name in INDEX_KEY_MAPS + ("by_install_dir",):
+            for key, names in shared.get(map_name, {}).items():
+                if not stale_games.isdisjoint(names):
+                    touched.add((map_name, key))
+
+        moved = set()
+        for map_name, key in touched - set(self.owners):
+            owner = self._owner(map_name, key)
+            claimants = {
+                name for name in shared.get(map_name, {}).get(key) or ([owner] if owner else [])
+                if name not in stale_games and name not in claims
             }
+            claimants = sorted(claimants | wanted.get((map_name, key), set()), key=order.__getitem__)
+            winner = claimants[-1] if claimants else None
+            self.owners[(map_name, key)] = winner
+            if len(claimants) > 1:
+                shared.setdefault(map_name, {})[key] = claimants
+            elif key in shared.get(map_name, {}):
+                del shared[map_name][key]
+            if winner != owner:
+                moved.update(name for name in (owner, winner)
+                             if name is not None and name not in stale_games and name not in claims)
+        return moved
+
+    def remove_games(self, game_names: Set[str]) -> None:
+        for map_name, key in list(self._keys_of(game_names)):
+            self.removed_keys.setdefault(map_name, set()).add(key)
+        self.removed_metadata |= self._base_metadata(game_names)
+        metadata = self.index["_metadata"]
+        stale = {meta_idx for meta_idx, meta in enumerate(metadata) if meta and meta.game_name in game_names}
+        for meta_idx in stale:
+            metadata[meta_idx] = None
+        for map_name in INDEX_KEY_MAPS:
+            mapping = self.index[map_name]
+            for key in [key for key, meta_idx in mapping.items() if meta_idx in stale]:
+                del mapping[key]
+        install_dirs = self.index["by_install_dir"]
+        for key in [key for key, data in install_dirs.items() if data["_meta"] in stale]:
+            del install_dirs[key]
+
+    def finish(self) -> Dict:
+        offset = self.games
+        index = self.index
+        if offset:
+            index["_metadata"] = [None] * offset + index["_metadata"]
+        for map_name in INDEX_KEY_MAPS:
+            mapping = index[map_name]
+            for key in mapping:
+                mapping[key] += offset
+        for data in index["by_install_dir"].values():
+            data["_meta"] += offset
+        names = sorted_names(index["by_name"])
+        index["by_name_trigram"] = build_trigram_postings(names)
+        index["by_name_trigram_weights"] = build_name_weights(len(names), index["by_name_trigram"])
+        self._metadata_buckets.clear()
+        return index
+
+    def patch(self, file_path: str) -> None:
+        # Writes the base index with the collected changes; added metadata goes
+        # after the base records.
+        offset = self.base.metadata_count
+        changes = {}
+        for map_name in INDEX_KEY_MAPS + ("by_install_dir",):
+            mapping = dict.fromkeys(self.removed_keys.get(map_name, ()))
+            for key, value in self.index[map_name].items():
+                if map_name == "by_install_dir":
+                    mapping[key] = {"_meta": value["_meta"] + offset, "launch": value["launch"]}
+                else:
+                    mapping[key] = value + offset
+            changes[map_name] = mapping
+        patch_binary_index(self.base, file_path, self.removed_metadata, self.index["_metadata"], changes)
+        self._metadata_buckets.clear()
+
+class _ManifestEventLoader(CParser, SafeConstructor, Resolver):
+    def __init__(self, stream):
+        CParser.__init__(self, stream)
+        SafeConstructor.__init__(self)
+        Resolver.__init__(self)
+
+def _construct_from_events(loader: _ManifestEventLoader, anchors: Dict[str, Any]) -> Any:
+    event = loader.get_event()
+
+    if isinstance(event, ScalarEvent):
+        if event.tag is None and not event.implicit[0]:
+            value = event.value
+        else:
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = loader.resolve(ScalarNode, event.value, event.implicit)
+            if tag == STR_TAG:
+                value = event.value
+            else:
+                constructor = loader.yaml_constructors.get(tag, SafeConstructor.construct_undefined)
+                value = constructor(loader, ScalarNode(tag, event.value, event.start_mark, event.end_mark))
+    elif isinstance(event, MappingStartEvent):
+        value = {}
+        while not loader.check_event(MappingEndEvent):
+            key = _construct_from_events(loader, anchors)
+            value[key] = _construct_from_events(loader, anchors)
+        loader.get_event()
+    elif isinstance(event, SequenceStartEvent):
+        value = []
+        while not loader.check_event(SequenceEndEvent):
+            value.append(_construct_from_events(loader, anchors))
+        loader.get_event()
+    elif isinstance(event, AliasEvent):
+        return anchors[event.anchor]
+    else:
+        raise yaml.YAMLError(f"Unexpected YAML event {event}")
 
-        launch_data = yaml_game_data.get("launch", {})
-        for launch_path in launch_data:
-            if launch_path.startswith("<base>/"):
-                path_key = launch_path[7:].lower()
-                index["by_path"][path_key] = meta_idx
-            
-            exe_name = os.path.basename(launch_path).lower()
-            if exe_name:
-                index["by_exe"][exe_name] = meta_idx
-    
-    if hasattr(index_yaml_data, '_cache'):
-        del index_yaml_data._cache
-        
+    if event.anchor:
+        anchors[event.anchor] = value
+    return value
+
+def iter_yaml_games(file_path: str) -> Iterator[Tuple[Any, Any]]:
+    # Yields (game name, game data) straight from parser events, so only one
+    # game of the manifest is ever materialized at a time.
+    with open(file_path, 'rb') as f:
+        loader = _ManifestEventLoader(f)
+        try:
+            loader.get_event()
+            if loader.check_event(StreamEndEvent):
+                return
+            loader.get_event()
+            if not loader.check_event(MappingStartEvent):
+                raise yaml.YAMLError(f"{file_path} is not a mapping of games")
+            loader.get_event()
+
+            anchors = {}
+            while not loader.check_event(MappingEndEvent):
+                yaml_game_name = _construct_from_events(loader, anchors)
+                yield yaml_game_name, _construct_from_events(loader, anchors)
+        finally:
+            loader.dispose()
+
+def get_peak_memory_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def index_yaml_stream(file_path: str, game_names: Optional[List[str]] = None,
+                      shared: Optional[Dict[str, Dict[str, List[str]]]] = None) -> Dict:
+    start_time = time.perf_counter()
+    builder = YamlIndexBuilder(shared=shared)
+    for yaml_game_name, yaml_game_data in iter_yaml_games(file_path):
+        builder.add_game(yaml_game_name, yaml_game_data)
+        if game_names is not None:
+            game_names.append(yaml_game_name)
+    index = builder.finish()
+
+    peak_memory = get_peak_memory_mb()
+    logger.info(f"Indexed {builder.games} games from {file_path} in {time.perf_counter() - start_time:.2f}s"
+                + (f" (peak RSS {peak_memory:.0f} MB)" if peak_memory is not None else ""))
     return index
 
+def _parse_manifest_section(key: str, raw: bytes) -> Tuple[Any, Any]:
+    game = yaml.load(raw, Loader=SafeLoader)
+    if not isinstance(game, dict) or len(game) != 1:
+        raise yaml.YAMLError(f"manifest section {key!r} is not a single game")
+    return next(iter(game.items()))
+
+def _patch_yaml_index(yaml_file: str, index_file: str, state: ManifestState, sections: Dict[str, str],
+                      changed_sections: Dict[str, bytes], removed: List[str]) -> Optional[Set[str]]:
+    # Patches the changed sections into the existing index and returns the games
+    # whose index entries changed, or None when the index has to be rebuilt.
+    old_index = load_binary_index(index_file)
+    if old_index is None:
+        return None
+    try:
+        parsed = {key: _parse_manifest_section(key, raw) for key, raw in changed_sections.items()}
+        stale_games = {state.games[key][1] for key in list(changed_sections) + removed if key in state.games}
+        changed_games = stale_games | {name for name, _ in parsed.values()}
+        if not changed_games:
+            return changed_games
+
+        order: Dict[str, int] = {}
+        section_keys: Dict[str, str] = {}
+        for position, key in enumerate(sections):
+            yaml_game_name = parsed[key][0] if key in parsed else state.games[key][1]
+            order[yaml_game_name] = position
+            section_keys[yaml_game_name] = key
+
+        builder = YamlIndexBuilder(old_index)
+        games = dict(parsed.values())
+        moved = pending = builder.settle_owners(
+            state.shared, stale_games, {name: yaml_game_keys(name, data) for name, data in games.items()}, order
+        )
+        while pending:
+            # Games that won or lost a shared key are re-added from their unchanged sections.
+            wanted = {section_keys[name] for name in pending}
+            reparsed = dict(_parse_manifest_section(key, raw)
+                            for key, _, raw in iter_manifest_sections(yaml_file) if key in wanted)
+            games.update(reparsed)
+            pending = builder.settle_owners(
+                state.shared, set(), {name: yaml_game_keys(name, data) for name, data in reparsed.items()}, order
+            ) - moved
+            moved |= pending
+        builder.remove_games(stale_games | moved)
+        for yaml_game_name, yaml_game_data in games.items():
+            builder.add_game(yaml_game_name, yaml_game_data)
+        builder.patch(index_file)
+    except yaml.YAMLError as e:
+        logger.error(f"Manifest delta unavailable, rebuilding index: {str(e)[:200]}")
+        return None
+    finally:
+        old_index.close()
+
+    for key in removed:
+        del state.games[key]
+    for key, (yaml_game_name, _) in parsed.items():
+        state.games[key] = [sections[key], yaml_game_name]
+    return changed_games | moved
+
+def update_yaml_index(yaml_file: str, index_file: str) -> Tuple[ManifestState, Optional[Set[str]]]:
+    # Re-parses only the manifest sections whose hash changed and patches them
+    # into the existing index. Returns the new manifest state (saved by the
+    # caller) and the games that changed, or None after a full rebuild.
+    start_time = time.perf_counter()
+    state = ManifestState()
+    sections = {}
+    changed_sections = {}
+    for key, digest, raw in iter_manifest_sections(yaml_file):
+        sections[key] = digest
+        known = state.games.get(key)
+        if known is None or known[0] != digest:
+            changed_sections[key] = raw
+    removed = [key for key in state.games if key not in sections]
+    previous_index = GameMatcher._file_signature(index_file)
+
+    changed_games = None
+    if (state.games and state.index_file == previous_index
+            and len(changed_sections) + len(removed) <= MANIFEST_DELTA_MAX_CHANGES):
+        changed_games = _patch_yaml_index(yaml_file, index_file, state, sections, changed_sections, removed)
+
+    if changed_games is not None:
+        logger.info(f"Patched {len(changed_games)} changed games into the index "
+                    f"in {time.perf_counter() - start_time:.2f}s")
+    else:
+        game_names: List[str] = []
+        state.shared = {}
+        save_binary_index(index_yaml_stream(yaml_file, game_names, state.shared), index_file)
+        # Section hashes are only usable if they line up with the parsed games.
+        state.games = (
+            {key: [digest, name] for (key, digest), name in zip(sections.items(), game_names)}
+            if len(game_names) == len(sections) else {}
+        )
+
+    state.index_file = GameMatcher._file_signature(index_file)
+    if changed_games and state.index_file == previous_index:
+        # The patched index was not written; don't describe the new manifest.
+        state.games = {}
+    state.manifest = GameMatcher._file_signature(yaml_file)
+    return state, changed_games
+
+def _json_record(value: Any) -> Dict:
+    if isinstance(value, MetadataRecord):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
 def save_index_to_file(index: Dict, file_path: str) -> None:
+    temp_path = file_path + ".tmp"
     try:
-        with open(file_path, "w", encoding="utf-8", buffering=2**18) as file: 
+        with open(temp_path, "w", encoding="utf-8", buffering=2**18) as file: 
             json.dump(
                 index,
                 file,
                 ensure_ascii=False,
                 separators=(',', ':'),
                 check_circular=False,
-                allow_nan=False
+                allow_nan=False,
+                default=_json_record
             )
+        os.replace(temp_path, file_path)
     except Exception as e:
         logger.error(f"Critical error saving {file_path}: {str(e)[:200]}...")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
 def load_index_from_file(file_path: str) -> Optional[Dict]:
     if not os.path.exists(file_path):
@@ -203,49 +549,6 @@ def load_index_from_file(file_path: str) -> Optional[Dict]:
         logger.error(f"Error loading index from {file_path}: {e}")
         return None
 
-def supports_vulkan():
-    try:
-        result = subprocess.run(["vulkaninfo"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return result.returncode == 0
-    except FileNotFoundError:
-        try:
-            vulkan_drivers_path = "/usr/share/vulkan/icd.d"
-            return os.path.exists(vulkan_drivers_path) and len(os.listdir(vulkan_drivers_path)) > 0
-        except Exception:
-            return False
-
-def is_steamos():
-    steamos_files = [
-        "/usr/share/steamos", 
-        "/home/deck", 
-    ]
-    is_steamos = False
-    try:
-        for file in steamos_files:
-            if os.path.exists(file):
-                is_steamos = True
-    except Exception as e:
-        logger.error(f"Error checking specific files: {e}")
-    logger.info("\nIs steamOS:"+str(is_steamos)+"\n")
-    return is_steamos
-
-def path_exists_case_insensitive(path, dir_cache):
-    p = Path(path)
-    if p.exists():
-        return str(p)
-    
-    current = Path(p.root) if p.is_absolute() else Path(".")
-    for part in p.parts[p.is_absolute():]:
-        if str(current) not in dir_cache:
-            dir_cache[str(current)] = list(current.iterdir())  
-        
-        matches = [child for child in dir_cache[str(current)] if child.name.lower() == part.lower()]
-        if not matches:
-            return False
-        current = matches[0]  
-    
-    return str(current)
-
 def generate_alternative_paths(relative_path):
     arch_pattern = re.compile(r'(x64|x86|x64vk|x86vk|win64|win32)', re.IGNORECASE)
     
@@ -268,20 +571,19 @@ def generate_alternative_paths(relative_path):
     return list(alternative_paths)
 
 def select_best_path(relative_path, base_path):
-    dir_cache = {}
-
     possible_paths = generate_alternative_paths(relative_path)
     
-    is_64bit = is_64bit_system()
+    profile = get_system_profile()
+    is_64bit = profile["is_64bit"]
     
-    supports_vk = supports_vulkan() or is_steamos()
+    supports_vk = profile["vulkan"] or profile["steamos"]
     
     valid_paths = []
+    resolved_paths = get_path_resolver().resolve_many(base_path, possible_paths)
 
     for path in possible_paths:
-        full_path = os.path.join(base_path, path)
-        logger.info(f"Checking path: {full_path}")
-        right_path = path_exists_case_insensitive(full_path, dir_cache)
+        logger.info(f"Checking path: {os.path.join(base_path, path)}")
+        right_path = resolved_paths[path]
         if right_path and os.path.isfile(right_path):
             logger.info("Valid path found.")
             valid_paths.append(right_path)
@@ -306,8 +608,9 @@ def select_best_path(relative_path, base_path):
     return best_path if best_path is not None else valid_paths[0]
 
 def sort_launch_paths(launch_paths):
-    current_os = platform.system().lower() 
-    is_64bit = is_64bit_system()  
+    profile = get_system_profile()
+    current_os = profile["os"]
+    is_64bit = profile["is_64bit"]
     
     prioritized_paths = []
     
@@ -349,62 +652,314 @@ def sort_launch_paths(launch_paths):
     return [path for path, _ in prioritized_paths]
 
 class DirectoryCache:
-    def __init__(self):
-        self._cache = {}
-        
-    def get_directory_contents(self, path):
-        normalized_path = os.path.normcase(os.path.normpath(path))
-        
-        if normalized_path not in self._cache:
+    # LRU of scandir results keyed by normalized path. Entries are revalidated
+    # against the directory mtime on every lookup (one stat instead of a
+    # scandir), and unreadable directories are cached as negative entries until
+    # they become readable. Safe to share between threads and across runs.
+    def __init__(self, max_entries: int = DIRECTORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Tuple[Optional[int], bool, Dict[str, List[str]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'invalidations': 0, 'evictions': 0}
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return os.path.normcase(os.path.normpath(path))
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _scan(path: str, mtime: Optional[int]) -> Tuple[Optional[int], bool, Dict[str, List[str]]]:
+        contents = {'dirs': [], 'files': []}
+        if mtime is None:
+            return None, True, contents
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    contents['dirs' if is_dir else 'files'].append(entry.name)
+        except OSError:
+            return mtime, True, {'dirs': [], 'files': []}
+        return mtime, False, contents
+
+    def get_directory_contents(self, path: str) -> Dict[str, List[str]]:
+        normalized_path = self._normalize(path)
+        current_mtime = self._mtime(normalized_path)
+
+        with self._lock:
+            cached = self._cache.get(normalized_path)
+            if cached is not None:
+                mtime, negative, contents = cached
+                if mtime == current_mtime:
+                    self._cache.move_to_end(normalized_path)
+                    self.stats['negative_hits' if negative else 'hits'] += 1
+                    return contents
+                del self._cache[normalized_path]
+                self.stats['invalidations'] += 1
+            self.stats['misses'] += 1
+
+        entry = self._scan(normalized_path, current_mtime)
+
+        with self._lock:
+            self._cache[normalized_path] = entry
+            self._cache.move_to_end(normalized_path)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.stats['evictions'] += 1
+        return entry[2]
+
+    def invalidate(self, path: str, recursive: bool = False) -> None:
+        normalized_path = self._normalize(path)
+        with self._lock:
+            stale = [normalized_path] if normalized_path in self._cache else []
+            if recursive:
+                prefix = normalized_path.rstrip(os.sep) + os.sep
+                stale.extend(cached_path for cached_path in self._cache if cached_path.startswith(prefix))
+            for cached_path in stale:
+                del self._cache[cached_path]
+            self.stats['invalidations'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def snapshot_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, cached=len(self._cache))
+
+    def describe_stats(self) -> str:
+        stats = self.snapshot_stats()
+        lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+        hit_rate = 100 * (stats['hits'] + stats['negative_hits']) / lookups if lookups else 0.0
+        return (f"{lookups} lookups, {hit_rate:.1f}% hits ({stats['negative_hits']} negative), "
+                f"{stats['invalidations']} invalidated, {stats['evictions']} evicted, {stats['cached']} cached")
+
+_shared_directory_cache: Optional[DirectoryCache] = None
+_shared_directory_cache_lock = threading.Lock()
+
+def get_shared_directory_cache() -> DirectoryCache:
+    # Entries revalidate themselves, so one cache can outlive a single run.
+    global _shared_directory_cache
+    with _shared_directory_cache_lock:
+        if _shared_directory_cache is None:
+            _shared_directory_cache = DirectoryCache()
+        return _shared_directory_cache
+
+class FolderSnapshot(NamedTuple):
+    root: str
+    files: Tuple[Tuple[str, int], ...]
+    dirs: Tuple[Tuple[str, int], ...]
+    exes: Tuple[Tuple[str, int], ...]
+    dir_reads: int
+    root_inode: int = 0
+    root_mtime: int = 0
+    dir_mtimes: Tuple[int, ...] = ()
+    # False when the walk stopped before max_depth, on a confident match or out of budget.
+    complete: bool = True
+    # True when the walk ran out of FOLDER_SCAN_MAX_ENTRIES / FOLDER_SCAN_TIME_BUDGET;
+    # whatever was matched from it is a best effort, not a final answer.
+    truncated: bool = False
+
+class FolderSearch:
+    # Breadth-first scandir walk of one root folder, expanded one depth level at
+    # a time so identification can stop on shallow evidence. Entries keep the
+    # (path, depth) order the matching strategies expect. The walk gives up,
+    # marked truncated, after max_entries entries or time_budget seconds.
+    def __init__(self, root_path: str, max_depth: Optional[int] = None,
+                 max_entries: Optional[int] = None, time_budget: Optional[float] = None):
+        self.root_path = root_path
+        self.max_depth = max_depth
+        self.max_entries = max_entries
+        self.deadline = time.perf_counter() + time_budget if time_budget else None
+        self.files, self.dirs, self.exes, self.dir_mtimes = [], [], [], []
+        self.dir_reads = 0
+        self.entries = 0
+        self.root_inode = self.root_mtime = 0
+        self.frontier = [(root_path, 0)]
+        self.truncated = False
+
+    @property
+    def done(self) -> bool:
+        return self.truncated or not self.frontier
+
+    def _over_budget(self) -> bool:
+        return ((self.max_entries is not None and self.entries >= self.max_entries)
+                or (self.deadline is not None and time.perf_counter() > self.deadline))
+
+    def expand_level(self) -> None:
+        next_level = []
+        for current_path, depth in self.frontier:
+            if self._over_budget():
+                self.truncated = True
+                return
+
+            if self.max_depth is not None and depth > self.max_depth:
+                continue
+
+            subdirs = []
             try:
-                contents = {
-                    'dirs': [],
-                    'files': []
-                }
-                with os.scandir(normalized_path) as it:
+                stat = os.stat(current_path)
+                with os.scandir(current_path) as it:
+                    self.dir_reads += 1
                     for entry in it:
-                        if entry.is_dir():
-                            contents['dirs'].append(entry.name)
+                        self.entries += 1
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if is_dir:
+                            subdirs.append(entry.name)
                         else:
-                            contents['files'].append(entry.name)
-                self._cache[normalized_path] = contents
+                            self.files.append((entry.path, depth))
+                            if entry.name.lower().endswith('.exe'):
+                                self.exes.append((entry.path, depth))
             except (OSError, PermissionError):
-                self._cache[normalized_path] = {
-                    'dirs': [],
-                    'files': []
-                }
-        
-        return self._cache[normalized_path]
-    
-    def clear(self):
-        self._cache.clear()
+                continue
 
-def find_root_directory(sync_folder: str, yaml_index_by_install_dir: dict, dir_cache: DirectoryCache, excluded_folders: set = None) -> dict:
-    if excluded_folders is None:
-        excluded_folders = set()
+            if depth > 0:
+                self.dirs.append((current_path, depth))
+                self.dir_mtimes.append(stat.st_mtime_ns)
+            else:
+                self.root_inode, self.root_mtime = stat.st_ino, stat.st_mtime_ns
 
-    matches = {}
-    try:
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for root_folder in os.listdir(sync_folder):
-                if root_folder.lower() in excluded_folders:
-                    continue
+            for dir_name in subdirs:
+                if dir_name.lower() not in IGNORED_DIRS:
+                    next_level.append((os.path.join(current_path, dir_name), depth + 1))
+        self.frontier = next_level
+
+    def snapshot(self) -> FolderSnapshot:
+        return FolderSnapshot(self.root_path, tuple(self.files), tuple(self.dirs), tuple(self.exes),
+                              self.dir_reads, self.root_inode, self.root_mtime, tuple(self.dir_mtimes),
+                              not self.frontier and not self.truncated, self.truncated)
+
+def build_folder_snapshot(root_path: str, max_depth: Optional[int] = None) -> FolderSnapshot:
+    search = FolderSearch(root_path, max_depth)
+    while not search.done:
+        search.expand_level()
+    return search.snapshot()
+
+def is_platform_probe_file(file_name: str) -> bool:
+    file_lower = file_name.lower()
+    return (file_lower.endswith('.exe')
+            or (file_lower.startswith("goggame-") and file_lower.endswith(".info"))
+            or file_lower.endswith(PLATFORM_FILE_EXTENSIONS))
+
+def snapshot_to_cache_entry(snapshot: FolderSnapshot) -> Tuple[List[list], List[list]]:
+    root = snapshot.root
+    dirs = [
+        [os.path.relpath(path, root), depth, mtime]
+        for (path, depth), mtime in zip(snapshot.dirs, snapshot.dir_mtimes)
+    ]
+    files = [
+        [os.path.relpath(path, root), depth]
+        for path, depth in snapshot.files
+        if is_platform_probe_file(os.path.basename(path))
+    ]
+    return dirs, files
+
+def snapshot_from_cache_entry(root: str, entry: Dict[str, Any]) -> FolderSnapshot:
+    files = tuple((os.path.join(root, rel_path), depth) for rel_path, depth in entry["files"])
+    return FolderSnapshot(
+        root,
+        files,
+        tuple((os.path.join(root, rel_path), depth) for rel_path, depth, _ in entry["dirs"]),
+        tuple(item for item in files if item[0].lower().endswith('.exe')),
+        0,
+        entry["inode"],
+        entry["mtime"],
+        tuple(mtime for _, _, mtime in entry["dirs"]),
+        entry.get("complete", True)
+    )
+
+YAML_VIEW_NAMES = ('by_exe', 'by_path', 'by_install_dir', 'by_gog_id', 'by_steam_id', 'by_name', 'by_name_trigram')
+
+def derive_yaml_view(yaml_data, view_name: str) -> Any:
+    if isinstance(yaml_data, BinaryIndex):
+        if view_name == 'by_name_trigram':
+            names = yaml_data.view('by_name')
+            return TrigramIndex(names.key_at, len(names), yaml_data.view(view_name),
+                                yaml_data.floats('by_name_trigram_weights'))
+        return yaml_data.view(view_name)
+
+    metadata = yaml_data["_metadata"]
+    if view_name == 'by_install_dir':
+        return {
+            install_dir: {
+                **metadata[data["_meta"]],
+                "launch": data["launch"]
+            }
+            for install_dir, data in yaml_data["by_install_dir"].items()
+        }
+    if view_name == 'by_name_trigram':
+        return TrigramIndex.from_names(sorted_names(yaml_data["by_name"]), yaml_data.get("by_name_trigram"),
+                                       yaml_data.get("by_name_trigram_weights"))
+    return {key: metadata[idx] for key, idx in yaml_data[view_name].items()}
+
+def derive_yaml_views(yaml_data) -> Dict[str, Any]:
+    return {f'yaml_{view_name}': derive_yaml_view(yaml_data, view_name) for view_name in YAML_VIEW_NAMES}
+
+class LazyIndexes(dict):
+    # Derived views are only materialized the first time they are accessed.
+    # signature describes the index files this generation was loaded from.
+    def __init__(self, xml_source, yaml_source, signature: str = ""):
+        super().__init__()
+        self.signature = signature
+        self._lock = threading.RLock()
+        self._builders = {'xml': xml_source, 'yaml': yaml_source}
+        for view_name in YAML_VIEW_NAMES:
+            self._builders[f'yaml_{view_name}'] = (
+                lambda view_name=view_name: derive_yaml_view(self['yaml'], view_name)
+            )
 
-                root_folder_path = os.path.join(sync_folder, root_folder)
+    def __missing__(self, key):
+        builder = self._builders.get(key)
+        if builder is None:
+            raise KeyError(key)
+        with self._lock:
+            if not dict.__contains__(self, key):
+                value = builder() if callable(builder) else builder
+                dict.__setitem__(self, key, value)
+            return dict.__getitem__(self, key)
 
-                if os.path.isdir(root_folder_path):
-                    futures.append(executor.submit(process_root_folder, root_folder_path, root_folder, yaml_index_by_install_dir, dir_cache))
-            
-            for future in futures:
-                result = future.result()
-                if result:
-                    matches.update(result)
-    
-    except Exception as e:
-        logger.error(f"Error searching root directories: {str(e)}")
-    
-    return matches
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or key in self._builders
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def built_views(self) -> List[str]:
+        return list(dict.keys(self))
+
+_shared_indexes: Dict[tuple, LazyIndexes] = {}
+_shared_indexes_lock = threading.Lock()
+
+def get_shared_indexes(key: tuple, xml_source, yaml_source, signature: str = "") -> Optional[LazyIndexes]:
+    # One set of views per index generation, shared by every GameMatcher in the process.
+    # yaml_source may be a loader: it only runs for a generation not seen yet, and
+    # None means the index could not be loaded.
+    with _shared_indexes_lock:
+        indexes = _shared_indexes.get(key)
+        if indexes is None:
+            yaml_index = yaml_source() if callable(yaml_source) else yaml_source
+            if yaml_index is None:
+                return None
+            _shared_indexes.clear()
+            indexes = _shared_indexes[key] = LazyIndexes(xml_source, yaml_index, signature)
+        return indexes
 
 def process_root_folder(root_folder_path, root_folder, yaml_index_by_install_dir, dir_cache):
     result = {}
@@ -448,133 +1003,116 @@ def process_root_folder(root_folder_path, root_folder, yaml_index_by_install_dir
 
 class GameMatcher:
     def __init__(self, sync_folder: str = DEFAULT_SYNC_FOLDER, xml_file: str = XML_FILE, 
-                yaml_file: str = YAML_FILE, indexes: dict = None, max_depth: int = 7):
+                yaml_file: str = YAML_FILE, indexes: dict = None, max_depth: int = 7,
+                dir_cache: Optional[DirectoryCache] = None, scan_cache: Optional[ScanCache] = None,
+                fingerprints: Optional[FingerprintStore] = None,
+                launcher_records: Optional[Dict[str, LauncherRecord]] = None):
         self.sync_folder = sync_folder
         self.xml_file = xml_file
         self.yaml_file = yaml_file
         self.index_dir = INDEX_DIR
         self.matches: Dict[str, Dict] = {}
-        self.dir_cache = DirectoryCache()
+        self.dir_cache = dir_cache if dir_cache is not None else get_shared_directory_cache()
         self.first_load_attempt = True
         self.max_depth = max_depth
+        self._snapshots: Dict[str, FolderSnapshot] = {}
+        # Reads of each snapshot already counted in dir_reads_saved.
+        self._reused_reads: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self.stats = {'snapshots': 0, 'dir_reads': 0, 'dir_reads_saved': 0,
+                      'launcher_matches': 0, 'fingerprint_matches': 0, 'install_dir_matches': 0, 'platform_matches': 0, 'xml_yaml_matches': 0,
+                      'platform_bytes_scanned': 0}
+        # Wall time per identification phase, summed across worker threads.
+        self.timings = {'walk': 0.0, 'fingerprint': 0.0, 'install_dir': 0.0, 'platform': 0.0, 'xml_yaml': 0.0}
+        self.platform_scan_bytes: Dict[str, int] = {}
+        # Root folders whose walk ran out of FOLDER_SCAN_MAX_ENTRIES / FOLDER_SCAN_TIME_BUDGET.
+        self.budget_exhausted: List[str] = []
+        self.user_selected_games: Dict[str, Dict] = {}
+        self.root_folders: Optional[List[str]] = None
+        self.pending_folders: List[str] = []
         
         self.index_files = {
             'xml': os.path.join(self.index_dir, "xml_index.json"),
-            'yaml': os.path.join(self.index_dir, "yaml_index.json")
+            'yaml': os.path.join(self.index_dir, "yaml_index.bin")
         }
         
         self.indexes = self._load_indexes(indexes)
+        self.scan_cache = scan_cache
+        self.fingerprints = fingerprints
+        self.launcher_records = launcher_records
+
+    def _index_signature(self) -> str:
+        # The files the loaded indexes came from, not whatever a background
+        # refresh has swapped in since.
+        return self.indexes.signature
     
     def _load_indexes(self, indexes=None) -> Dict[str, Any]:
-        if indexes is None:
-            indexes = {
-                'xml': load_index_from_file(self.index_files['xml']),
-                'yaml': load_index_from_file(self.index_files['yaml'])
-            }
-        else:
-            indexes = {
-                'xml': indexes.get('xml', load_index_from_file(self.index_files['xml'])),
-                'yaml': indexes.get('yaml', load_index_from_file(self.index_files['yaml']))
-            }
-        
-        if not all(indexes.values()):
+        if isinstance(indexes, LazyIndexes):
+            return indexes
+        indexes = indexes or {}
+        xml_index = indexes.get('xml')
+        yaml_index = indexes.get('yaml')
+
+        missing_xml = xml_index is None and not os.path.exists(self.index_files['xml'])
+        missing_yaml = yaml_index is None and not is_current_binary_index(self.index_files['yaml'])
+        if missing_xml or missing_yaml:
             if self.first_load_attempt:
                 self.first_load_attempt = False
                 logger.info("Generating indexes...")
                 create_or_update_indexes()
-                return self._load_indexes()
+                return self._load_indexes(indexes)
             else:
                 logger.error("Could not load indexes. Execution aborted.")
                 sys.exit(1)
 
-        if indexes['yaml']:
-            yaml_data = indexes['yaml']
-            indexes['yaml_by_exe'] = {exe: yaml_data["_metadata"][idx] 
-                                    for exe, idx in yaml_data["by_exe"].items()}
-            indexes['yaml_by_path'] = {path: yaml_data["_metadata"][idx] 
-                                    for path, idx in yaml_data["by_path"].items()}
-            indexes['yaml_by_install_dir'] = {
-                install_dir: {
-                    **yaml_data["_metadata"][data["_meta"]],
-                    "launch": data["launch"]
-                }
-                for install_dir, data in yaml_data["by_install_dir"].items()
-            }
-            indexes['yaml_by_gog_id'] = {gog_id: yaml_data["_metadata"][idx]
-                                    for gog_id, idx in yaml_data["by_gog_id"].items()}
-            indexes['yaml_by_steam_id'] = {steam_id: yaml_data["_metadata"][idx]
-                                        for steam_id, idx in yaml_data["by_steam_id"].items()}
-            
-            indexes['yaml_by_name'] = {name: yaml_data["_metadata"][idx]
-                                    for name, idx in yaml_data["by_name"].items()}
-            
-            indexes['yaml_by_name_fuzzy'] = {}
-            for part, idx_list in yaml_data["by_name_fuzzy"].items():
-                unique_indexes = list(dict.fromkeys(idx_list))
-                indexes['yaml_by_name_fuzzy'][part] = [
-                    yaml_data["_metadata"][idx] for idx in unique_indexes
-                ]
-        
+        xml_source = xml_index if xml_index is not None else (
+            lambda: load_index_from_file(self.index_files['xml']) or {}
+        )
+        # The binary index is only mapped when no matcher has loaded this generation yet.
+        if yaml_index is None:
+            yaml_key = self._file_signature(self.index_files['yaml'])
+            yaml_source = partial(load_binary_index, self.index_files['yaml'])
+        else:
+            yaml_key = (self._file_signature(yaml_index.file_path) if isinstance(yaml_index, BinaryIndex)
+                        else id(yaml_index))
+            yaml_source = yaml_index
+        key = (id(xml_index) if xml_index is not None else self._file_signature(self.index_files['xml']), yaml_key)
+
+        indexes = get_shared_indexes(key, xml_source, yaml_source, index_files_signature(self.index_files))
+        if indexes is None:
+            logger.error("Could not load indexes. Execution aborted.")
+            sys.exit(1)
         return indexes
 
-    def _get_directory_contents(self, path: str, depth: int = 0) -> Dict[str, List[str]]:
-        cached_contents = None
+    @staticmethod
+    def _file_signature(file_path: str) -> str:
         try:
-            cached_contents = self.dir_cache.get_directory_contents(path)
-        except Exception as e:
-            logger.warning(f"Warning: Cache error for {path} - {str(e)}")
+            stat = os.stat(file_path)
+            return f"{file_path}:{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}"
+        except OSError:
+            return file_path
 
-        if cached_contents:
-            return cached_contents
-        
-        try:
-            contents = {'dirs': [], 'files': []}
-            with os.scandir(path) as it:
-                for entry in it:
-                    if entry.is_dir():
-                        contents['dirs'].append(entry.name)
-                    else:
-                        contents['files'].append(entry.name)
-            
-            try:
-                self.dir_cache.update_directory_contents(path, contents)
-            except Exception as e:
-                logger.warning(f"Warning: Cache update failed for {path} - {str(e)}")
-            
-            return contents
-            
-        except Exception as e:
-            logger.error(f"Error scanning directory {path}: {str(e)}")
-            return {'dirs': [], 'files': []}
+    def _get_directory_contents(self, path: str, depth: int = 0) -> Dict[str, List[str]]:
+        return self.dir_cache.get_directory_contents(path)
 
-    def _explore_directory_tree(self, root_path: str) -> List[Dict]:
-        results = []
-        queue = deque([(root_path, 0)])
-        
-        while queue:
-            current_path, depth = queue.popleft()
-            
-            if self.max_depth is not None and depth > self.max_depth:
-                continue
-                
-            try:
-                contents = self.dir_cache.get_directory_contents(current_path)
-            except Exception:
-                contents = self._get_directory_contents(current_path) 
-                
-            for file in contents['files']:
-                results.append({
-                    'path': os.path.join(current_path, file),
-                    'depth': depth,
-                    'type': 'file'
-                })
-                
-            for dir_name in contents['dirs']:
-                if dir_name.lower() not in IGNORED_DIRS:
-                    dir_path = os.path.join(current_path, dir_name)
-                    queue.append((dir_path, depth + 1))
-        
-        return results
+    def _get_snapshot(self, root_folder_path: str) -> FolderSnapshot:
+        with self._stats_lock:
+            snapshot = self._snapshots.get(root_folder_path)
+            if snapshot is not None:
+                # A reused snapshot saves its scandir calls once, however often it is asked for.
+                reused = self._reused_reads.get(root_folder_path, 0)
+                self.stats['dir_reads_saved'] += snapshot.dir_reads - reused
+                self._reused_reads[root_folder_path] = snapshot.dir_reads
+                return snapshot
+
+        snapshot = build_folder_snapshot(root_folder_path, self.max_depth)
+
+        with self._stats_lock:
+            self._snapshots[root_folder_path] = snapshot
+            self.stats['snapshots'] += 1
+            self.stats['dir_reads'] += snapshot.dir_reads
+
+        return snapshot
 
     def _load_user_selected_games(self) -> Dict[str, Dict]:
         games_json_path = DEFAULT_GAMES_INFO_PATH
@@ -609,79 +1147,228 @@ class GameMatcher:
         
         return excluded
 
-    def associate_exes_with_ids(self) -> Dict[str, Dict]:
+    def plan_folders(self, sync_folders: Set[str] = frozenset(), claimed: Optional[Set[str]] = None) -> List[Tuple[str, str]]:
+        # Fills self.matches with cached and user selected games and returns the
+        # (root_folder, root_folder_path) pairs that still need identifying.
         if not os.path.exists(self.sync_folder):
             logger.error(f"Game directory '{self.sync_folder}' does not exist or cannot be accessed.")
-            return {}
+            return []
 
-        user_selected_games = self._load_user_selected_games()
-        excluded_folders = self._get_excluded_folders(user_selected_games)
+        self.user_selected_games = self._load_user_selected_games()
+        excluded_folders = self._get_excluded_folders(self.user_selected_games)
         excluded_folders.update(IGNORED_DIRS)
-        logger.info("Searching for matches in root directories...")
-        self.matches = find_root_directory(
-            sync_folder=self.sync_folder,
-            yaml_index_by_install_dir=self.indexes['yaml_by_install_dir'],
-            dir_cache=self.dir_cache,
-            excluded_folders=excluded_folders
-        )
-        self.matches.update(user_selected_games)
-        logger.info(f"Initial matches found: {len(self.matches)}")
+        if self.scan_cache is None:
+            self.scan_cache = ScanCache(index_signature=self._index_signature(), index_changes=load_index_changes())
+        if self.fingerprints is None:
+            self.fingerprints = FingerprintStore(index_signature=self.scan_cache.index_signature,
+                                                 index_changes=self.scan_cache.index_changes)
+        if self.launcher_records is None:
+            self.launcher_records = index_launcher_records(load_launcher_records())
+
+        self.matches = {}
+        self.root_folders = []
+        for root_folder in os.listdir(self.sync_folder):
+            root_folder_path = os.path.join(self.sync_folder, root_folder)
+            if not os.path.isdir(root_folder_path) or root_folder.lower() in excluded_folders:
+                continue
+            real_path = real_folder_path(root_folder_path)
+            if any(is_same_or_parent(real_path, sync_folder) for sync_folder in sync_folders):
+                # The folder is (or holds) another sync folder: a library, not a game.
+                continue
+            if claimed is not None:
+                if real_path in claimed:
+                    continue
+                claimed.add(real_path)
+            record = self.launcher_records.get(real_path)
+            if record is not None and record.exe_path:
+                # The launcher already knows what this is; no need to walk it.
+                self.matches[root_folder] = self._match_from_launcher(record)
+                self.stats['launcher_matches'] += 1
+                continue
+            self.root_folders.append(root_folder)
+
+        self.pending_folders = []
+        for root_folder in self.root_folders:
+            root_folder_path = os.path.join(self.sync_folder, root_folder)
+            entry = self.scan_cache.lookup(root_folder_path, self.max_depth)
+            if entry is None:
+                self.pending_folders.append(root_folder)
+            elif self.scan_cache.has_valid_match(entry):
+                if entry["match"]:
+                    self.matches[root_folder] = entry["match"]
+            else:
+                if entry.get("complete", True):
+                    self._snapshots[root_folder_path] = snapshot_from_cache_entry(root_folder_path, entry)
+                self.pending_folders.append(root_folder)
+
+        logger.info(f"Scan cache: {len(self.root_folders) - len(self.pending_folders)} unchanged folders reused, "
+                    f"{len(self.pending_folders)} to identify in {self.sync_folder}")
 
-        folders_to_process = [
+        self.matches.update(self.user_selected_games)
+        return [
             (root_folder, os.path.join(self.sync_folder, root_folder))
-            for root_folder in os.listdir(self.sync_folder)
-            if os.path.isdir(os.path.join(self.sync_folder, root_folder))
-            and (root_folder not in self.matches) and
-            (root_folder.lower() not in excluded_folders)
+            for root_folder in self.pending_folders
+            if root_folder not in self.matches
         ]
 
-        logger.info("\nSearching for platform identifiers (Steam/GOG)...")
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(self._process_platform_identifiers, folder, path): folder
-                for folder, path in folders_to_process
-            }
-
-            for future in as_completed(futures):
-                folder = futures[future]
-                try:
-                    result = future.result()
-                    if result:
-                        self.matches[folder] = result
-                        folders_to_process = [
-                            (f, p) for f, p in folders_to_process 
-                            if f not in self.matches
-                        ]
-                except Exception as e:
-                    logger.error(f"Error processing {folder}: {str(e)}")
-
-        logger.info(f"Matches after platform search: {len(self.matches)}")
-
-        logger.info("\nSearching for matches in XML/YAML...")
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(self._process_root_folder, folder, path): folder
-                for folder, path in folders_to_process
-                if folder not in self.matches
-            }
-
-            for future in as_completed(futures):
-                folder = futures[future]
-                try:
-                    result = future.result()
+    def identify_folder(self, root_folder: str, root_folder_path: str) -> Optional[Dict]:
+        # Walks the folder one depth level at a time. Each new level is checked
+        # for a known exe fingerprint, platform identifiers and exact XML/YAML
+        # evidence (install dir once, up front) before the next one is read;
+        # weaker XML/YAML guesses only count once the walk is complete or out of budget.
+        with self._stats_lock:
+            snapshot = self._snapshots.get(root_folder_path)
+        search = None
+        if snapshot is None:
+            search = FolderSearch(root_folder_path, self.max_depth, FOLDER_SCAN_MAX_ENTRIES, FOLDER_SCAN_TIME_BUDGET)
+
+        seen_exes = seen_files = 0
+        first_level = True
+        # The first platform id found, kept until its exe can be resolved.
+        platform_hits: List[Dict] = []
+        try:
+            while True:
+                if search is not None:
+                    start = time.perf_counter()
+                    search.expand_level()
+                    snapshot = search.snapshot()
+                    elapsed = time.perf_counter() - start
+                    with self._stats_lock:
+                        self._snapshots[root_folder_path] = snapshot
+                        self.timings['walk'] += elapsed
+                complete = search is None or search.done
+
+                phases = [('fingerprint', partial(self.fingerprints.lookup, snapshot.exes[seen_exes:]))]
+                if first_level:
+                    phases.append(('install_dir', lambda: process_root_folder(
+                        root_folder_path, root_folder, self.indexes['yaml_by_install_dir'], self.dir_cache
+                    ).get(root_folder)))
+                phases.append(('platform', partial(
+                    self._process_platform_identifiers, root_folder, root_folder_path, seen_files,
+                    platform_hits, complete
+                )))
+                phases.append(('xml_yaml', partial(self._process_root_folder, root_folder, root_folder_path, complete)))
+                seen_exes, seen_files = len(snapshot.exes), len(snapshot.files)
+                first_level = False
+
+                for phase, identify in phases:
+                    if phase == 'xml_yaml' and platform_hits and not complete:
+                        # A platform id outranks XML/YAML evidence once the walk can resolve its exe.
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        result = identify()
+                    except Exception as e:
+                        logger.error(f"Error processing {root_folder}: {str(e)}")
+                        result = None
+                    with self._stats_lock:
+                        self.timings[phase] += time.perf_counter() - start
+                        if result:
+                            self.stats[f'{phase}_matches'] += 1
                     if result:
-                        self.matches[folder] = result
-                except Exception as e:
-                    logger.error(f"Error processing {folder}: {str(e)}")
-
-        logger.info(f"Final matches found: {len(self.matches)}")
+                        return result
+                if complete:
+                    return None
+        finally:
+            if search is not None:
+                with self._stats_lock:
+                    self.stats['snapshots'] += 1
+                    self.stats['dir_reads'] += search.dir_reads
+                    if search.truncated:
+                        self.budget_exhausted.append(root_folder)
+
+    def finish(self, save: bool = True) -> Dict[str, Dict]:
+        if self.root_folders is None:
+            return self.matches
+        self._update_scan_cache(self.root_folders, self.pending_folders, self.user_selected_games)
+        self._update_fingerprints()
+        if save:
+            self.scan_cache.save()
+            self.fingerprints.prune_paths()
+            self.fingerprints.save()
+
+        logger.info(f"Matches in {self.sync_folder}: {len(self.matches)} "
+                    f"(launcher {self.stats['launcher_matches']}, fingerprint {self.stats['fingerprint_matches']}, "
+                    f"install dir {self.stats['install_dir_matches']}, platform {self.stats['platform_matches']}, "
+                    f"XML/YAML {self.stats['xml_yaml_matches']})")
+        logger.info(f"Directory reads: {self.stats['dir_reads']} in {self.stats['snapshots']} folder snapshots "
+                    f"({self.stats['dir_reads_saved']} saved by reusing snapshots)")
+        if self.platform_scan_bytes:
+            largest = max(self.platform_scan_bytes, key=self.platform_scan_bytes.get)
+            logger.info(f"Platform file scan: {self.stats['platform_bytes_scanned'] / 1024:.0f} KiB in "
+                        f"{len(self.platform_scan_bytes)} folders (most: {os.path.basename(largest)}, "
+                        f"{self.platform_scan_bytes[largest] / 1024:.0f} KiB)")
+        if self.budget_exhausted:
+            logger.warning(f"Scan budget exhausted in {len(self.budget_exhausted)} folders, identified from a "
+                           f"partial walk: {', '.join(sorted(self.budget_exhausted))}")
         return self.matches
 
-    def _process_platform_identifiers(self, root_folder: str, root_folder_path: str) -> Optional[Dict]:
-        platform_info = self._identify_platform(root_folder_path)
-        
-        if not platform_info:
-            return None
+    def associate_exes_with_ids(self) -> Dict[str, Dict]:
+        folders = self.plan_folders()
+        logger.info("Identifying root directories...")
+        identify_folders((self, root_folder, root_folder_path) for root_folder, root_folder_path in folders)
+        matches = self.finish()
+        logger.info(f"Directory cache: {self.dir_cache.describe_stats()}")
+        return matches
+
+    def _update_scan_cache(self, root_folders: List[str], pending_folders: List[str],
+                           user_selected_games: Dict[str, Dict]) -> None:
+        for root_folder in pending_folders:
+            if root_folder in user_selected_games:
+                continue
+            root_folder_path = os.path.join(self.sync_folder, root_folder)
+            snapshot = self._get_snapshot(root_folder_path)
+            if not snapshot.root_inode:
+                continue
+            dirs, files = snapshot_to_cache_entry(snapshot)
+            self.scan_cache.store(root_folder_path, snapshot.root_inode, snapshot.root_mtime,
+                                  dirs, files, self.matches.get(root_folder), self.max_depth,
+                                  snapshot.complete, snapshot.truncated)
+
+        self.scan_cache.prune(
+            self.sync_folder,
+            {os.path.join(self.sync_folder, root_folder) for root_folder in root_folders}
+        )
+
+    def _match_from_launcher(self, record: LauncherRecord) -> Dict:
+        yaml_entry = None
+        if record.launcher == 'heroic-gog':
+            yaml_entry = self.indexes['yaml_by_gog_id'].get(record.app_id)
+        if yaml_entry is None:
+            yaml_entry = self.indexes['yaml_by_name'].get(record.title.lower())
+
+        match = self._format_match(record.exe_path, yaml_entry or {"game_name": record.title})
+        if record.launcher == 'heroic-gog':
+            match["gog_id"] = record.app_id
+        elif record.launcher == 'lutris' and not match["lutris_id"]:
+            match["lutris_id"] = record.app_id
+        match.update(launcher=record.launcher, launcher_id=record.app_id, prefix=record.prefix)
+        return match
+
+    def _update_fingerprints(self) -> None:
+        budget_exhausted = set(self.budget_exhausted)
+        for root_folder in self.pending_folders:
+            match = self.matches.get(root_folder)
+            if match and root_folder not in self.user_selected_games and root_folder not in budget_exhausted:
+                self.fingerprints.record(os.path.join(self.sync_folder, root_folder), match)
+
+        # User selections are fingerprinted once, so they follow the folder if it is renamed or moved.
+        for root_folder, data in self.user_selected_games.items():
+            exe_path = data.get('exe_path')
+            if exe_path and os.path.exists(exe_path) and not self.fingerprints.is_recorded(exe_path, user_selected=True):
+                self.fingerprints.record(os.path.join(self.sync_folder, root_folder), data, user_selected=True)
+
+    def _process_platform_identifiers(self, root_folder: str, root_folder_path: str, first_file: int = 0,
+                                      pending: Optional[List[Dict]] = None, complete: bool = True) -> Optional[Dict]:
+        # pending keeps the first hit of a level-by-level walk: its exe may only
+        # show up deeper, and the best-exe fallback waits for the complete tree.
+        platform_info = pending[0] if pending else None
+        if platform_info is None:
+            platform_info = self._identify_platform(root_folder_path, first_file)
+            if not platform_info:
+                return None
+            if pending is not None:
+                pending.append(platform_info)
         
         if platform_info['platform'] == 'gog':
             gog_data = platform_info['data']
@@ -693,43 +1380,50 @@ class GameMatcher:
                     'name': gog_data['name'],
                     'path': gog_data['path']
                 },
-                exe_path=gog_data.get('exe_path', '')
+                exe_path=gog_data.get('exe_path', ''),
+                fallback=complete
             )
         elif platform_info['platform'] == 'steam':
             return self._handle_steam_match(
                 root_folder=root_folder,
                 root_folder_path=root_folder_path,
                 steam_appid=platform_info['data']['appid'], 
-                steam_file=platform_info['data']['source_file']
+                steam_file=platform_info['data']['source_file'],
+                fallback=complete
             )
         
         return None
 
-    def _identify_platform(self, folder_path: str) -> Optional[Dict]:
-        for item in self._explore_directory_tree(folder_path):
-            if item['type'] != 'file':
-                continue
+    def _identify_platform(self, folder_path: str, first_file: int = 0) -> Optional[Dict]:
+        # first_file skips files already checked at shallower levels of the walk.
+        scanned = 0
+        try:
+            for file_path, _ in self._get_snapshot(folder_path).files[first_file:]:
+                file = os.path.basename(file_path)
+                file_lower = file.lower()
                 
-            file_path = item['path']
-            file = os.path.basename(file_path)
-            file_lower = file.lower()
-            
-            if file_lower.startswith("goggame-") and file_lower.endswith(".info"):
-                platform_info = self._handle_gog_detection(file_path, file)
-                if platform_info:
-                    return platform_info
-            
-            elif file_lower == "steam_appid.txt":
-                platform_info = self._handle_steam_appid_detection(file_path)
-                if platform_info:
-                    return platform_info
+                if file_lower.startswith("goggame-") and file_lower.endswith(".info"):
+                    platform_info = self._handle_gog_detection(file_path, file)
+                    if platform_info:
+                        return platform_info
+                
+                elif file_lower == "steam_appid.txt":
+                    platform_info = self._handle_steam_appid_detection(file_path)
+                    if platform_info:
+                        return platform_info
+                
+                elif file_lower.endswith(PLATFORM_FILE_EXTENSIONS):
+                    platform_info, read = self._handle_content_detection(file_path, folder_path)
+                    scanned += read
+                    if platform_info:
+                        return platform_info
             
-            elif file_lower.endswith(('.ini', '.txt', '.cfg', '.json')):
-                platform_info = self._handle_steam_pattern_detection(file_path)
-                if platform_info:
-                    return platform_info
-        
-        return None
+            return None
+        finally:
+            if scanned:
+                with self._stats_lock:
+                    self.stats['platform_bytes_scanned'] += scanned
+                    self.platform_scan_bytes[folder_path] = self.platform_scan_bytes.get(folder_path, 0) + scanned
 
     def _handle_gog_detection(self, file_path: str, filename: str) -> Optional[Dict]:
         try:
@@ -789,36 +1483,27 @@ class GameMatcher:
             logger.error(f"Error reading {file_path}: {str(e)}")
         return None
 
-    def _handle_steam_pattern_detection(self, file_path: str) -> Optional[Dict]:
-        patterns = [
-            re.compile(r'appid\s*=\s*(\d{3,})', re.IGNORECASE),  # Original pattern
-            re.compile(r'#\s*appid\s*[\r\n]+\s*id\s*=\s*(\d{3,})', re.IGNORECASE)  # New pattern
-        ]
-        
+    def _handle_content_detection(self, file_path: str, folder_path: str) -> Tuple[Optional[Dict], int]:
         try:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except UnicodeDecodeError:
-                with open(file_path, 'r', encoding='latin-1') as f:
-                    content = f.read()
-            
-            if file_path.lower().endswith('.json'):
-                try:
-                    json_data = json.loads(content)
-                    if appid := self._find_appid_in_json(json_data):
-                        return self._build_steam_response(appid, file_path)
-                except json.JSONDecodeError:
-                    pass  
-            
-            for pattern in patterns:
-                if match := pattern.search(content):
-                    return self._build_steam_response(match.group(1), file_path)
-                    
-        except Exception as e:
+            hit, read = scan_platform_ids(file_path, PLATFORM_SCAN_BYTES)
+        except OSError as e:
             logger.error(f"Error processing {file_path}: {str(e)}")
-        
-        return None
+            return None, 0
+        if hit is None:
+            return None, read
+
+        kind, platform_id = hit
+        if kind in STEAM_KINDS:
+            return self._build_steam_response(platform_id, file_path), read
+        return {
+            'platform': 'gog',
+            'data': {
+                'id': platform_id,
+                'name': os.path.basename(folder_path),
+                'path': os.path.abspath(file_path),
+                'exe_path': ''
+            }
+        }, read
 
     def _build_steam_response(self, appid: str, source_file: str) -> Dict:
         return {
@@ -829,53 +1514,8 @@ class GameMatcher:
             }
         }
 
-    def _search_appid_in_file(self, file_path: str, pattern: re.Pattern) -> Optional[str]:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-                if file_path.lower().endswith('.json'):
-                    try:
-                        json_data = json.loads(content)
-                        return self._find_appid_in_json(json_data)
-                    except json.JSONDecodeError:
-                        pass
-                
-                match = pattern.search(content)
-                if match:
-                    return match.group(1)
-                    
-        except (IOError, UnicodeDecodeError) as e:
-            logger.error(f"Error reading {file_path}: {str(e)}")
-        
-        return None
-
-    def _find_appid_in_json(self, json_data: Any) -> Optional[str]:
-        try:
-            if isinstance(json_data, dict):
-                if 'appid' in json_data:
-                    appid = json_data['appid']
-                    if isinstance(appid, (str, int, float)):
-                        appid_str = str(int(float(appid))) 
-                        if len(appid_str) >= 3:
-                            return appid_str
-                
-                for value in json_data.values():
-                    if result := self._find_appid_in_json(value):
-                        return result
-            
-            elif isinstance(json_data, list):
-                for item in json_data:
-                    if result := self._find_appid_in_json(item):
-                        return result
-        
-        except (TypeError, ValueError) as e:
-            logger.error(f"Error processing JSON: {str(e)}")
-        
-        return None
-
     def _handle_steam_match(self, root_folder: str, root_folder_path: str, 
-                        steam_appid: str, steam_file: str) -> Optional[Dict]:
+                        steam_appid: str, steam_file: str, fallback: bool = True) -> Optional[Dict]:
         yaml_entry = self.indexes['yaml_by_steam_id'].get(steam_appid)
         
         result = {
@@ -906,7 +1546,7 @@ class GameMatcher:
                     if exe_path:
                         break
         
-        if not exe_path:
+        if not exe_path and fallback:
             exe_path = self._find_best_exe_in_folder(
                 root_folder_path, 
                 reference_name=result["game_name"],
@@ -920,7 +1560,7 @@ class GameMatcher:
         return None 
 
     def _handle_gog_match(self, root_folder: str, root_folder_path: str, 
-                        gog_info: Dict, exe_path: str = '') -> Optional[Dict]:
+                        gog_info: Dict, exe_path: str = '', fallback: bool = True) -> Optional[Dict]:
         yaml_entry = self.indexes['yaml_by_gog_id'].get(gog_info['id'])
         
         result = {
@@ -946,7 +1586,7 @@ class GameMatcher:
                         result["exe_path"] = candidate
                         break
         
-        if not result["exe_path"]:
+        if not result["exe_path"] and fallback:
             result["exe_path"] = self._find_best_exe_in_folder(
                 root_folder_path,
                 reference_name=result["game_name"],
@@ -960,39 +1600,22 @@ class GameMatcher:
         best_exe = None
         best_score = -1
         
-        items_to_search = (
-            self._explore_directory_tree(folder_path) 
-            if search_subdirs 
-            else [{'path': folder_path, 'type': 'directory', 'depth': 0}]
-        )
-        
-        for item in items_to_search:
-            if item['type'] == 'directory' and not search_subdirs:
-                contents = self._get_directory_contents(item['path'])
-                files = contents['files']
-            elif item['type'] == 'file':
-                files = [os.path.basename(item['path'])]
-            else:
+        for file_path, depth in self._get_snapshot(folder_path).exes:
+            if depth > 0 and not search_subdirs:
                 continue
-                
-            for file in files:
-                if not file.lower().endswith('.exe') or file.lower() in IGNORED_FILES:
-                    continue
-                    
-                file_path = (
-                    os.path.join(item['path'], file) 
-                    if item['type'] == 'directory' 
-                    else item['path']
-                )
-                
-                current_score = self._calculate_name_similarity(
-                    os.path.splitext(file)[0],
-                    reference_name
-                )
-                
-                if current_score > best_score:
-                    best_score = current_score
-                    best_exe = file_path
+
+            file = os.path.basename(file_path)
+            if file.lower() in IGNORED_FILES:
+                continue
+
+            current_score = self._calculate_name_similarity(
+                os.path.splitext(file)[0],
+                reference_name
+            )
+
+            if current_score > best_score:
+                best_score = current_score
+                best_exe = file_path
         
         return best_exe
 
@@ -1012,16 +1635,20 @@ class GameMatcher:
         
         return common_prefix
 
-    def _process_root_folder(self, root_folder: str, root_folder_path: str) -> Dict:
+    def _process_root_folder(self, root_folder: str, root_folder_path: str, complete: bool = True) -> Dict:
         try:
-            jre_paths = self._find_jre_paths(root_folder_path)
             xml_candidates = self._find_xml_candidates(root_folder_path)
             
             if xml_candidates:
                 best_match = self._find_best_match_from_candidates(xml_candidates)
             else:
                 best_match = self._find_direct_yaml_match(root_folder_path)
+
+            if not complete:
+                # Part of the tree is still unread: only exact evidence ends the search.
+                return best_match if best_match and self._is_confident_match(best_match, root_folder_path) else None
             
+            jre_paths = self._find_jre_paths(root_folder_path)
             if not best_match and (jre_paths['jre'] or jre_paths['jre_x64']):
                 best_match = self._find_java_match(jre_paths)
             
@@ -1034,37 +1661,41 @@ class GameMatcher:
             logger.error(f"Error processing {root_folder}: {str(e)}")
             return None
     
+    def _is_confident_match(self, match: Dict, root_folder_path: str) -> bool:
+        # The exe is a manifest launch path of the matched game, or XML and YAML
+        # independently name the same game for it.
+        exe_path = normalize_path(match["exe_path"])
+        yaml_entry = self.indexes['yaml_by_path'].get(
+            normalize_path(os.path.relpath(exe_path, normalize_path(root_folder_path))))
+        if yaml_entry is not None and yaml_entry["game_name"] == match["game_name"]:
+            return True
+        exe_name = os.path.basename(exe_path)
+        yaml_entry = self.indexes['yaml_by_exe'].get(exe_name)
+        return (yaml_entry is not None and yaml_entry["game_name"] == match["game_name"]
+                and os.path.splitext(exe_name)[0] in self.indexes['xml'])
+
     def _find_jre_paths(self, root_folder_path: str) -> Dict[str, Optional[str]]:
         jre_paths = {'jre': None, 'jre_x64': None}
         
-        for item in self._explore_directory_tree(root_folder_path):
-            if item['type'] != 'directory':
-                continue
-                
-            dir_name = os.path.basename(item['path'])
+        for dir_path, _ in self._get_snapshot(root_folder_path).dirs:
+            dir_name = os.path.basename(dir_path)
             if dir_name == 'jre':
-                jre_paths['jre'] = item['path']
+                jre_paths['jre'] = dir_path
             elif dir_name == 'jre_x64':
-                jre_paths['jre_x64'] = item['path']
+                jre_paths['jre_x64'] = dir_path
         
         return jre_paths
     
     def _find_xml_candidates(self, root_folder_path: str) -> List[Dict]:
         candidates = []
         
-        for item in self._explore_directory_tree(root_folder_path):
-            if item['type'] != 'file':
-                continue
-                
-            file = os.path.basename(item['path'])
-            if not file.lower().endswith('.exe'):
-                continue
-                
+        for file_path, depth in self._get_snapshot(root_folder_path).exes:
+            file = os.path.basename(file_path)
             exe_name_without_ext = os.path.splitext(file)[0].lower()
             if exe_name_without_ext in IGNORED_FILES:
                 continue
                 
-            exe_path = normalize_path(item['path'])
+            exe_path = os.path.normpath(file_path)
             relative_path = normalize_path(os.path.relpath(exe_path, self.sync_folder))
             
             if game_name := self.indexes['xml'].get(exe_name_without_ext):
@@ -1072,7 +1703,7 @@ class GameMatcher:
                     "exe_path": exe_path,
                     "game_name": game_name,
                     "relative_path": relative_path,
-                    "depth": item['depth']
+                    "depth": depth
                 })
         
         return candidates
@@ -1105,19 +1736,13 @@ class GameMatcher:
         best_match = None
         best_match_score = 0
         
-        for item in self._explore_directory_tree(root_folder_path):
-            if item['type'] != 'file':
-                continue
-                
-            file = os.path.basename(item['path'])
-            if not file.lower().endswith('.exe'):
-                continue
-                
+        for file_path, depth in self._get_snapshot(root_folder_path).exes:
+            file = os.path.basename(file_path)
             exe_name_without_ext = os.path.splitext(file)[0].lower()
             if exe_name_without_ext in IGNORED_FILES:
                 continue
                 
-            exe_path = normalize_path(item['path'])
+            exe_path = os.path.normpath(file_path)
             relative_path = normalize_path(os.path.relpath(exe_path, self.sync_folder))
             
             yaml_entry = (self.indexes['yaml_by_path'].get(relative_path) or 
@@ -1132,11 +1757,11 @@ class GameMatcher:
                 "steam_id": yaml_entry["steam_id"],
                 "lutris_id": yaml_entry["lutris_id"],
                 "gog_id": yaml_entry["gog_id"],
-                "depth": item['depth'],
+                "depth": depth,
                 "files": yaml_entry["files"]
             }
             
-            match_score = 1000 - item['depth']  
+            match_score = 1000 - depth  
             if match_score > best_match_score:
                 best_match = game_info
                 best_match_score = match_score
@@ -1147,7 +1772,7 @@ class GameMatcher:
         best_match = None
         best_match_score = 0
         
-        search_order = ['jre_x64', 'jre'] if is_64bit_system() else ['jre', 'jre_x64']
+        search_order = ['jre_x64', 'jre'] if get_system_profile()["is_64bit"] else ['jre', 'jre_x64']
         
         for jre_type in search_order:
             if not jre_paths[jre_type]:
@@ -1186,19 +1811,16 @@ class GameMatcher:
         exe_files = []
         folder_name = os.path.basename(root_folder_path)
         
-        for item in self._explore_directory_tree(root_folder_path):
-            if item['type'] != 'file':
-                continue
-                
-            file = os.path.basename(item['path'])
-            if not file.lower().endswith('.exe') or file.lower() in IGNORED_FILES:
+        for file_path, _ in self._get_snapshot(root_folder_path).exes:
+            file = os.path.basename(file_path)
+            if file.lower() in IGNORED_FILES:
                 continue
                 
             exe_files.append({
-                'path': item['path'],
+                'path': file_path,
                 'name': os.path.splitext(file)[0],
                 'name_lower': os.path.splitext(file)[0].lower(),
-                'relative_path': normalize_path(os.path.relpath(item['path'], self.sync_folder))
+                'relative_path': normalize_path(os.path.relpath(file_path, self.sync_folder))
             })
         
         if not exe_files:
@@ -1215,35 +1837,21 @@ class GameMatcher:
                 return self._format_match(exe['path'], match)
         
         if exe_files:
-            def _simple_match_score(a: str, b: str) -> int:
-                a, b = a.lower(), b.lower()
-                if a == b:
-                    return 100
-                if a in b or b in a:
-                    return 90
-                common = set(a.split()) & set(b.split())
-                return int(80 * len(common) / max(len(a.split()), len(b.split())))
-
-            best_match = None
-            best_score = 0
+            best_name = None
+            best_score = 0.0
             
             search_terms = {folder_name.lower()}
             for exe in exe_files:
                 search_terms.add(exe['name_lower'])
-                search_terms.update(exe['name_lower'].split())
             
             for term in search_terms:
-                if term in self.indexes['yaml_by_name_fuzzy']:
-                    for match in self.indexes['yaml_by_name_fuzzy'][term]:
-                        current_score = _simple_match_score(term, match['game_name'])
-                        if current_score > best_score:
-                            best_score = current_score
-                            best_match = match
-                            if best_score == 100:  
-                                return self._format_match(exe_files[0]['path'], best_match)
+                score, name = self.indexes['yaml_by_name_trigram'].best_match(term, FUZZY_MATCH_CUTOFF)
+                if score > best_score:
+                    best_score = score
+                    best_name = name
             
-            if best_match and best_score >= 50: 
-                return self._format_match(exe_files[0]['path'], best_match)
+            if best_name is not None:
+                return self._format_match(exe_files[0]['path'], self.indexes['yaml_by_name'][best_name])
         
         best_exe = max(exe_files, key=lambda x: len(x['name'])) 
         return {
@@ -1296,42 +1904,232 @@ def associate_exes_with_ids(sync_folder: str = DEFAULT_SYNC_FOLDER, xml_file: st
     
     return final_matches
 
-def create_or_update_indexes() -> Dict[str, Any]:
-    index_dir = INDEX_DIR
-    os.makedirs(index_dir, exist_ok=True)
+def index_files_signature(index_files: Dict[str, str]) -> str:
+    parts = []
+    for index_file in index_files.values():
+        try:
+            stat = os.stat(index_file)
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            parts.append("")
+    return "|".join(parts)
+
+def real_folder_path(path: str) -> str:
+    return os.path.normcase(os.path.realpath(path))
+
+def index_launcher_records(records: List[LauncherRecord]) -> Dict[str, LauncherRecord]:
+    by_path = {}
+    for record in records:
+        by_path.setdefault(real_folder_path(record.install_path), record)
+    return by_path
+
+def is_same_or_parent(path: str, other: str) -> bool:
+    return other == path or other.startswith(path.rstrip(os.sep) + os.sep)
+
+def dedupe_sync_folders(sync_folders: List[str]) -> List[str]:
+    # Drops sync folders that resolve to one already listed (symlinks, trailing
+    # slashes, case on Windows). Nested ones are kept; their parent skips them.
+    seen = set()
+    unique = []
+    for sync_folder in sync_folders:
+        real_path = real_folder_path(sync_folder)
+        if real_path not in seen:
+            seen.add(real_path)
+            unique.append(sync_folder)
+    return unique
+
+def identify_folders(work: Iterator[Tuple["GameMatcher", str, str]], max_workers: Optional[int] = None) -> None:
+    # One pool for every folder, queued per storage device so each device gets
+    # its own concurrency limit instead of sharing the workers first come, first served.
+    results_lock = threading.Lock()
+
+    def identify(matcher: "GameMatcher", root_folder: str, root_folder_path: str) -> None:
+        result = matcher.identify_folder(root_folder, root_folder_path)
+        if result:
+            with results_lock:
+                matcher.matches[root_folder] = result
+
+    get_io_scheduler().run(
+        ((root_folder_path, partial(identify, matcher, root_folder, root_folder_path))
+         for matcher, root_folder, root_folder_path in work),
+        max_workers
+    )
+
+def identify_sync_folders(sync_folders: List[str], xml_file: str = XML_FILE, yaml_file: str = YAML_FILE,
+                          indexes: dict = None, max_depth: int = 7,
+                          max_workers: Optional[int] = None, report: Optional[Dict[str, Any]] = None) -> Dict[str, Dict]:
+    # report, when given, is filled with per-phase timings and counts for the run.
+    phase_start = time.perf_counter()
+    sync_folders = dedupe_sync_folders(sync_folders)
+    real_sync_folders = {real_folder_path(sync_folder) for sync_folder in sync_folders}
+    dir_cache = get_shared_directory_cache()
+    claimed: Set[str] = set()
+
+    matchers = []
+    scan_cache = None
+    fingerprints = None
+    launcher_records = index_launcher_records(load_launcher_records())
+    logger.info(f"Launcher databases: {len(launcher_records)} installed games")
+    for sync_folder in sync_folders:
+        matcher = GameMatcher(sync_folder, xml_file, yaml_file, indexes, max_depth,
+                              dir_cache=dir_cache, scan_cache=scan_cache, fingerprints=fingerprints,
+                              launcher_records=launcher_records)
+        if scan_cache is None:
+            # Every sync folder is matched against the generation the first one
+            # loaded, even if a background refresh swaps the index files meanwhile.
+            indexes = matcher.indexes
+            scan_cache = matcher.scan_cache = ScanCache(index_signature=matcher._index_signature(),
+                                                        index_changes=load_index_changes())
+            fingerprints = matcher.fingerprints = FingerprintStore(index_signature=scan_cache.index_signature,
+                                                                   index_changes=scan_cache.index_changes)
+        matchers.append(matcher)
+
+    work = []
+    for matcher in matchers:
+        own_folder = real_folder_path(matcher.sync_folder)
+        work.extend(
+            (matcher, root_folder, root_folder_path)
+            for root_folder, root_folder_path in matcher.plan_folders(real_sync_folders - {own_folder}, claimed)
+        )
 
-    indexes = {}
+    timings = {'plan': time.perf_counter() - phase_start}
 
+    logger.info(f"Identifying {len(work)} root directories across {len(matchers)} sync folders...")
+    phase_start = time.perf_counter()
+    identify_folders(iter(work), max_workers)
+    timings['identify'] = time.perf_counter() - phase_start
+
+    phase_start = time.perf_counter()
+    all_matches = {}
+    for matcher in matchers:
+        all_matches.update(matcher.finish(save=False))
+    if scan_cache is not None:
+        scan_cache.save()
+    if fingerprints is not None:
+        fingerprints.prune_paths()
+        fingerprints.save()
+    timings['finish'] = time.perf_counter() - phase_start
+    logger.info(f"Directory cache: {dir_cache.describe_stats()}")
+    if device_limits := get_io_scheduler().describe():
+        logger.info(f"Device I/O limits: {device_limits}")
+
+    if report is not None:
+        counts: Dict[str, int] = {'root_folders': len(work), 'matches': len(all_matches)}
+        phases: Dict[str, float] = {}
+        budget_exhausted = []
+        for matcher in matchers:
+            for key, value in matcher.stats.items():
+                counts[key] = counts.get(key, 0) + value
+            for phase, elapsed in matcher.timings.items():
+                phases[phase] = phases.get(phase, 0.0) + elapsed
+            budget_exhausted.extend(os.path.join(matcher.sync_folder, folder) for folder in matcher.budget_exhausted)
+        report.update({
+            'sync_folders': sync_folders,
+            'timings': timings,
+            'phases': phases,
+            'counts': counts,
+            'caches': {
+                'directory': dir_cache.snapshot_stats(),
+                'scan': {'hits': scan_cache.hits, 'misses': scan_cache.misses} if scan_cache is not None else {},
+                'fingerprint': {'hits': fingerprints.hits} if fingerprints is not None else {},
+            },
+            'budget_exhausted': sorted(budget_exhausted),
+        })
+    return all_matches
+
+def create_or_update_indexes() -> Dict[str, Any]:
     with ThreadPoolExecutor(max_workers=2) as executor:
         xml_future = executor.submit(download_file, XML_URL, XML_FILE)
         yaml_future = executor.submit(download_file, YAML_URL, YAML_FILE)
         xml_changed = xml_future.result()
         yaml_changed = yaml_future.result()
 
+    return build_indexes(xml_changed, yaml_changed)
+
+def build_indexes(xml_changed: bool, yaml_changed: bool) -> Dict[str, Any]:
+    index_dir = INDEX_DIR
+    os.makedirs(index_dir, exist_ok=True)
+
+    indexes = {}
+
+    index_files = {
+        'xml': os.path.join(index_dir, "xml_index.json"),
+        'yaml': os.path.join(index_dir, "yaml_index.bin")
+    }
+    previous_signature = index_files_signature(index_files)
+
     with ThreadPoolExecutor() as executor:
         futures = {}
-        if xml_changed or not os.path.exists(os.path.join(index_dir, "xml_index.json")):
+        if xml_changed or not os.path.exists(index_files['xml']):
             futures['xml'] = executor.submit(
                 lambda: index_xml_data(ET.parse(XML_FILE).getroot()))
         
-        if yaml_changed or not os.path.exists(os.path.join(index_dir, "yaml_index.json")):
-            futures['yaml'] = executor.submit(
-                lambda: index_yaml_data(load_yaml_file(YAML_FILE)))
+        if yaml_changed or not is_current_binary_index(index_files['yaml']):
+            futures['yaml'] = executor.submit(update_yaml_index, YAML_FILE, index_files['yaml'])
 
+        manifest_state = None
+        changed_games = None
         for index_type, future in futures.items():
             try:
-                indexes[index_type] = future.result()
-                save_index_to_file(
-                    indexes[index_type],
-                    os.path.join(index_dir, f"{index_type}_index.json"))
+                if index_type == 'yaml':
+                    manifest_state, changed_games = future.result()
+                    # Hand out the memory-mapped index and let the built dicts go.
+                    indexes[index_type] = load_binary_index(index_files[index_type])
+                else:
+                    indexes[index_type] = future.result()
+                    save_index_to_file(indexes[index_type], index_files[index_type])
             except Exception as e:
                 logger.error(f"Error: {str(e)[:100]}")
 
+    if manifest_state is not None:
+        # Cached matches survive a patch unless their game is among the changes.
+        if changed_games is not None and 'xml' not in futures:
+            manifest_state.record_change(previous_signature, index_files_signature(index_files), changed_games)
+        else:
+            manifest_state.changes = []
+        manifest_state.save()
+
+    legacy_yaml_index = os.path.join(index_dir, "yaml_index.json")
+    if os.path.exists(index_files['yaml']) and os.path.exists(legacy_yaml_index):
+        os.remove(legacy_yaml_index)
+
     logger.info("Índices actualizados")
     return indexes
 
+_index_refresh_thread: Optional[threading.Thread] = None
+_index_refresh_lock = threading.Lock()
+
+def indexes_available() -> bool:
+    return (os.path.exists(os.path.join(INDEX_DIR, "xml_index.json"))
+            and is_current_binary_index(os.path.join(INDEX_DIR, "yaml_index.bin")))
+
+def refresh_indexes_in_background() -> threading.Thread:
+    # Stale-while-revalidate: callers keep the indexes on disk while this checks
+    # for newer manifests. Rebuilt indexes are swapped in by atomic rename, and
+    # GameMatcher picks them up by file signature on its next load.
+    global _index_refresh_thread
+    with _index_refresh_lock:
+        if _index_refresh_thread is None or not _index_refresh_thread.is_alive():
+            # Daemon: exiting does not wait on a refresh. Indexes are replaced by
+            # rename, so an interrupted one only leaves a temp file behind.
+            _index_refresh_thread = threading.Thread(
+                target=create_or_update_indexes, name="index-refresh", daemon=True
+            )
+            _index_refresh_thread.start()
+        return _index_refresh_thread
+
+def wait_for_index_refresh(timeout: Optional[float] = None) -> None:
+    with _index_refresh_lock:
+        thread = _index_refresh_thread
+    if thread is not None:
+        thread.join(timeout)
+
 def verify_and_download_files():
 
+    if os.path.exists(XML_FILE) and os.path.exists(YAML_FILE) and indexes_available():
+        refresh_indexes_in_background()
+        return {}
+
     if not os.path.exists(XML_FILE):
         logger.info(f"XML file not found in path: {XML_FILE}")
         logger.info("trying to download the XML file from GitHub...")
@@ -1443,14 +2241,8 @@ def run_identification():
     indexes = verify_and_download_files()
     sync_folders = get_sync_folders()
     max_depth = 8
-    
-    all_matches = {}
-    for folder in sync_folders:
-        logger.info(f"\n Processing folder: {folder}")
-        matches = associate_exes_with_ids(folder, XML_FILE, YAML_FILE, indexes, max_depth)
-        all_matches.update(matches)
-    
-    return all_matches
+
+    return identify_sync_folders(sync_folders, XML_FILE, YAML_FILE, indexes, max_depth)
 
 def add_files_to_user_selected(games_data: dict, matcher: GameMatcher) -> dict:
     yaml_by_name = matcher.indexes.get('yaml_by_name', {})
@@ -0,0 +1,557 @@
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from trigram_index import build_name_weights, trigrams
+
+logger = logging.getLogger("no_steam_to_steam.log")
+
+# On-disk layout of the ludusavi index (all integers little-endian):
+#   MAGIC | version u32 | toc length u32 | toc (JSON {section: [offset, length]}) | sections
+# Key maps are stored as sorted UTF-8 keys (offsets + blob) with a parallel
+# u32 value array, so lookups are a binary search over the memory map.
+MAGIC = b"NS2SIDX\x00"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sII")
+SECTION_ALIGNMENT = 8
+
+META_FIELDS = ("game_name", "steam_id", "lutris_id", "gog_id", "alias")
+# The game name leading a packed metadata record: a JSON string or scalar.
+FIRST_FIELD = re.compile(rb'\[("(?:[^"\\]|\\.)*"|[^,\]]*)')
+
+SINGLE_MAPS = ("by_exe", "by_path", "by_gog_id", "by_steam_id", "by_name")
+INSTALL_DIR_MAP = "by_install_dir"
+# Posting lists hold positions into the sorted by_name keys rather than metadata indexes.
+POSTING_MAPS = ("by_name_trigram",)
+FLOAT_ARRAYS = ("by_name_trigram_weights",)
+
+class IndexFormatError(ValueError):
+    pass
+
+def _u32_array(values) -> array:
+    data = array("I", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+def _f32_array(values) -> array:
+    data = array("f", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+def _pack_blobs(blobs) -> Tuple[bytes, array]:
+    offsets = [0]
+    parts = []
+    position = 0
+    for blob in blobs:
+        parts.append(blob)
+        position += len(blob)
+        offsets.append(position)
+    return b"".join(parts), _u32_array(offsets)
+
+def _dump(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+
+def _sorted_keys(mapping: Dict[str, Any]) -> List[str]:
+    return sorted(mapping, key=lambda key: key.encode("utf-8"))
+
+def _intern(value: Any) -> Any:
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [_intern(item) for item in value]
+    return value
+
+class MetadataRecord(Mapping):
+    # Metadata of one game while an index is built or patched in memory: scalar
+    # fields in slots with interned strings, and files kept out of line as the
+    # JSON blob the binary index stores, decoded only when asked for.
+    __slots__ = ("game_name", "steam_id", "lutris_id", "gog_id", "alias", "files_blob")
+
+    def __init__(self, game_name: Any, steam_id: Any, lutris_id: Any, gog_id: Any, alias: Any, files_blob: bytes):
+        self.game_name = _intern(game_name)
+        self.steam_id = _intern(steam_id)
+        self.lutris_id = _intern(lutris_id)
+        self.gog_id = _intern(gog_id)
+        self.alias = _intern(alias)
+        self.files_blob = files_blob
+
+    @classmethod
+    def from_fields(cls, game_name: Any, steam_id: Any, lutris_id: Any, gog_id: Any, alias: Any,
+                    files: Dict[str, Any]) -> "MetadataRecord":
+        return cls(game_name, steam_id, lutris_id, gog_id, alias, _dump(files))
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "files":
+            return json.loads(self.files_blob) if self.files_blob else {}
+        if key not in META_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(META_FIELDS + ("files",))
+
+    def __len__(self) -> int:
+        return len(META_FIELDS) + 1
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MetadataRecord):
+            return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"MetadataRecord({self.game_name!r})"
+
+def _files_blob(meta: Any) -> bytes:
+    if not meta:
+        return b""
+    return meta.files_blob if isinstance(meta, MetadataRecord) else _dump(meta["files"])
+
+def _meta_blob(meta: Any) -> bytes:
+    return _dump([meta[field] for field in META_FIELDS]) if meta else b""
+
+def _map_sections(sections: Dict[str, Any], map_name: str, mapping: Dict[str, Any]) -> None:
+    keys = _sorted_keys(mapping)
+    sections[f"{map_name}.keys"], key_offsets = _pack_blobs(key.encode("utf-8") for key in keys)
+    sections[f"{map_name}.keys.off"] = key_offsets.tobytes()
+
+    if map_name == INSTALL_DIR_MAP:
+        sections[f"{map_name}.vals"] = _u32_array(mapping[key]["_meta"] for key in keys).tobytes()
+        sections[f"{map_name}.launch"], launch_offsets = _pack_blobs(
+            _dump(mapping[key]["launch"]) for key in keys
+        )
+        sections[f"{map_name}.launch.off"] = launch_offsets.tobytes()
+    elif map_name in POSTING_MAPS:
+        postings = []
+        bounds = []
+        for key in keys:
+            bounds.extend((len(postings), len(mapping[key])))
+            postings.extend(mapping[key])
+        sections[f"{map_name}.vals"] = _u32_array(bounds).tobytes()
+        sections[f"{map_name}.postings"] = _u32_array(postings).tobytes()
+    else:
+        sections[f"{map_name}.vals"] = _u32_array(mapping[key] for key in keys).tobytes()
+
+def save_binary_index(index: Dict, file_path: str) -> None:
+    sections: Dict[str, Any] = {}
+    metadata = index["_metadata"]
+
+    sections["meta"], meta_offsets = _pack_blobs(_meta_blob(meta) for meta in metadata)
+    sections["meta.off"] = meta_offsets.tobytes()
+    sections["files"], files_offsets = _pack_blobs(_files_blob(meta) for meta in metadata)
+    sections["files.off"] = files_offsets.tobytes()
+
+    for map_name in SINGLE_MAPS + (INSTALL_DIR_MAP,) + POSTING_MAPS:
+        _map_sections(sections, map_name, index.get(map_name, {}))
+
+    for array_name in FLOAT_ARRAYS:
+        sections[array_name] = _f32_array(index.get(array_name, [])).tobytes()
+
+    _write_sections(sections, file_path)
+
+def _write_sections(sections: Dict[str, Any], file_path: str) -> None:
+    toc = {}
+    position = 0
+    for name, data in sections.items():
+        toc[name] = [position, len(data)]
+        position += len(data) + (-len(data) % SECTION_ALIGNMENT)
+    toc_bytes = _dump(toc)
+    data_start = HEADER.size + len(toc_bytes)
+    padding = -data_start % SECTION_ALIGNMENT
+    toc_bytes += b" " * padding
+
+    temp_path = file_path + ".tmp"
+    try:
+        with open(temp_path, "wb", buffering=2**18) as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(toc_bytes)))
+            f.write(toc_bytes)
+            for data in sections.values():
+                f.write(data)
+                f.write(b"\x00" * (-len(data) % SECTION_ALIGNMENT))
+        # Replace instead of rewriting in place: open memory maps keep the old inode.
+        os.replace(temp_path, file_path)
+    except Exception as e:
+        logger.error(f"Critical error saving {file_path}: {str(e)[:200]}...")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# An edit replaces the items at positions [start, end) of a packed section
+# with new ones; edits are applied in position order.
+Edit = Tuple[int, int, List[Any]]
+
+def _splice_blobs(blob: memoryview, offsets: memoryview, edits: List[Edit]) -> Tuple[List[Any], List[int]]:
+    # Runs between edits are copied as they are, only their offsets are shifted.
+    parts = []
+    new_offsets = [0]
+    cursor = 0
+    for start, end, blobs in edits + [(len(offsets) - 1, len(offsets) - 1, [])]:
+        if start > cursor:
+            parts.append(blob[offsets[cursor]:offsets[start]])
+            shift = new_offsets[-1] - offsets[cursor]
+            run = offsets[cursor + 1:start + 1]
+            new_offsets.extend([offset + shift for offset in run] if shift else run)
+        for item in blobs:
+            parts.append(item)
+            new_offsets.append(new_offsets[-1] + len(item))
+        cursor = end
+    return parts, new_offsets
+
+def _splice_values(values: memoryview, edits: List[Edit]) -> List[int]:
+    result = []
+    cursor = 0
+    for start, end, items in edits + [(len(values), len(values), [])]:
+        result.extend(values[cursor:start])
+        result.extend(items)
+        cursor = end
+    return result
+
+def _patch_blob_sections(sections: Dict[str, Any], index: "BinaryIndex", name: str, edits: List[Edit]) -> None:
+    parts, offsets = _splice_blobs(index._section(name), index._u32(f"{name}.off"), edits)
+    sections[name] = b"".join(parts)
+    sections[f"{name}.off"] = _u32_array(offsets).tobytes()
+
+def _key_edits(view: "IndexView", changes: Dict[str, Any]) -> List[Edit]:
+    # None removes a key; any other value adds it or replaces its value.
+    edits = []
+    for key in _sorted_keys(changes):
+        encoded = key.encode("utf-8")
+        position = view._bisect(encoded)
+        found = position < len(view) and view._key_at(position) == encoded
+        if changes[key] is not None:
+            edits.append((position, position + found, [(encoded, changes[key])]))
+        elif found:
+            edits.append((position, position + 1, []))
+    return edits
+
+def _patch_trigram_postings(sections: Dict[str, Any], index: "BinaryIndex", edits: List[Edit]) -> None:
+    # Name positions after the edited by_name keys shift; postings of the names
+    # added or removed are merged, every other posting is only renumbered.
+    names = index.view("by_name")
+    new_positions: List[int] = []
+    added = []
+    touched = set()
+    shift = 0
+    cursor = 0
+    for start, end, items in edits + [(len(names), len(names), [])]:
+        new_positions.extend(range(cursor + shift, start + shift))
+        if end > start and items:
+            new_positions.append(start + shift)
+        elif end > start:
+            new_positions.append(-1)
+            touched.update(trigrams(names.key_at(start)))
+            shift -= 1
+        else:
+            for key, _ in items:
+                added.append((start + shift, key.decode("utf-8")))
+                shift += 1
+        cursor = end
+
+    map_name = POSTING_MAPS[0]
+    view = index.view(map_name)
+    all_postings = index._u32(f"{map_name}.postings")
+    postings: Dict[str, List[int]] = {}
+    for position in range(len(view)):
+        start, count = view._values[2 * position], view._values[2 * position + 1]
+        postings[view.key_at(position)] = [new_positions[name] for name in all_postings[start:start + count]]
+    for position, name in added:
+        for gram in trigrams(name):
+            touched.add(gram)
+            postings.setdefault(gram, []).append(position)
+    for gram in touched:
+        posting = sorted(name for name in postings.get(gram, ()) if name >= 0)
+        if posting:
+            postings[gram] = posting
+        else:
+            postings.pop(gram, None)
+
+    _map_sections(sections, map_name, postings)
+    sections[FLOAT_ARRAYS[0]] = _f32_array(build_name_weights(len(names) + shift, postings)).tobytes()
+
+def patch_binary_index(index: "BinaryIndex", file_path: str, removed_metadata: Set[int],
+                       metadata: List[Any], changes: Dict[str, Dict[str, Any]]) -> None:
+    # Writes index with the given changes spliced into its sections: metadata
+    # appended after the existing records, removed records emptied in place and
+    # per map key changes as _key_edits() takes them. Sections nothing touches
+    # are copied byte for byte, so nothing else is decoded.
+    sections: Dict[str, Any] = {}
+    count = index.metadata_count
+    for name, blob in (("meta", _meta_blob), ("files", _files_blob)):
+        edits = [(meta_idx, meta_idx + 1, [b""]) for meta_idx in sorted(removed_metadata)]
+        edits.append((count, count, [blob(meta) for meta in metadata]))
+        _patch_blob_sections(sections, index, name, edits)
+
+    for map_name in SINGLE_MAPS + (INSTALL_DIR_MAP,):
+        view = index.view(map_name)
+        edits = _key_edits(view, changes.get(map_name, {}))
+        if not edits:
+            continue
+        parts, key_offsets = _splice_blobs(view._keys, view._key_offsets,
+                                           [(start, end, [key for key, _ in items]) for start, end, items in edits])
+        sections[f"{map_name}.keys"] = b"".join(parts)
+        sections[f"{map_name}.keys.off"] = _u32_array(key_offsets).tobytes()
+        if map_name == INSTALL_DIR_MAP:
+            values = [(start, end, [value["_meta"] for _, value in items]) for start, end, items in edits]
+            _patch_blob_sections(sections, index, f"{map_name}.launch", [
+                (start, end, [_dump(value["launch"]) for _, value in items]) for start, end, items in edits
+            ])
+        else:
+            values = [(start, end, [value for _, value in items]) for start, end, items in edits]
+        sections[f"{map_name}.vals"] = _u32_array(_splice_values(view._values, values)).tobytes()
+        if map_name == "by_name" and any(end - start != len(items) for start, end, items in edits):
+            _patch_trigram_postings(sections, index, edits)
+
+    for name in index._toc:
+        if name not in sections:
+            sections[name] = index._section(name)
+    _write_sections(sections, file_path)
+
+class BinaryIndex:
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mm) < HEADER.size:
+            raise IndexFormatError(f"{file_path} is truncated")
+        magic, version, toc_length = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise IndexFormatError(f"{file_path} is not a binary index")
+        if version != FORMAT_VERSION:
+            raise IndexFormatError(f"{file_path} has index format {version}, expected {FORMAT_VERSION}")
+
+        self._toc = json.loads(self._mm[HEADER.size:HEADER.size + toc_length])
+        self._data_start = HEADER.size + toc_length
+        self._buffer = memoryview(self._mm)
+        self._sections: Dict[str, memoryview] = {}
+        self._arrays: Dict[str, memoryview] = {}
+        self.metadata_count = len(self._u32("meta.off")) - 1
+
+    def _section(self, name: str) -> memoryview:
+        section = self._sections.get(name)
+        if section is None:
+            try:
+                offset, length = self._toc[name]
+            except KeyError:
+                raise IndexFormatError(f"{self.file_path} has no section {name}")
+            start = self._data_start + offset
+            section = self._buffer[start:start + length]
+            self._sections[name] = section
+        return section
+
+    def _typed(self, name: str, typecode: str) -> memoryview:
+        values = self._arrays.get(name)
+        if values is None:
+            section = self._section(name)
+            if sys.byteorder == "little":
+                values = section.cast(typecode)
+            else:
+                values = memoryview(array(typecode, struct.unpack(f"<{len(section) // 4}{typecode}", section)))
+            self._arrays[name] = values
+        return values
+
+    def _u32(self, name: str) -> memoryview:
+        return self._typed(name, "I")
+
+    def floats(self, name: str) -> memoryview:
+        return self._typed(name, "f")
+
+    def _blob(self, name: str, position: int) -> bytes:
+        offsets = self._u32(f"{name}.off")
+        return bytes(self._section(name)[offsets[position]:offsets[position + 1]])
+
+    def has_metadata(self, meta_idx: int) -> bool:
+        offsets = self._u32("meta.off")
+        return 0 <= meta_idx < self.metadata_count and offsets[meta_idx + 1] > offsets[meta_idx]
+
+    def metadata(self, meta_idx: int) -> Dict[str, Any]:
+        return dict(zip(META_FIELDS, json.loads(self._blob("meta", meta_idx))))
+
+    def files(self, meta_idx: int) -> Dict[str, Any]:
+        blob = self._blob("files", meta_idx)
+        return json.loads(blob) if blob else {}
+
+    def record(self, meta_idx: int, launch_position: Optional[int] = None) -> "IndexRecord":
+        return IndexRecord(self, meta_idx, launch_position)
+
+    def launch(self, position: int) -> Dict[str, Any]:
+        return json.loads(self._blob(f"{INSTALL_DIR_MAP}.launch", position))
+
+    def view(self, map_name: str) -> "IndexView":
+        return IndexView(self, map_name)
+
+    def metadata_by_game(self) -> Dict[Any, List[int]]:
+        # Metadata indexes per game name; only the leading name of each record
+        # is decoded.
+        offsets = self._u32("meta.off")
+        start = self._data_start + self._toc["meta"][0]
+        by_game: Dict[Any, List[int]] = {}
+        for meta_idx in range(self.metadata_count):
+            if offsets[meta_idx + 1] > offsets[meta_idx]:
+                name = FIRST_FIELD.match(self._mm, start + offsets[meta_idx]).group(1)
+                if name[:1] == b'"' and b"\\" not in name:
+                    name = name[1:-1].decode("utf-8")
+                else:
+                    name = json.loads(name)
+                by_game.setdefault(name, []).append(meta_idx)
+        return by_game
+
+    def to_dict(self) -> Dict[str, Any]:
+        # The builder layout save_binary_index takes. Decodes every section, so
+        # it is meant for tools and benchmarks; posting maps are left out.
+        index: Dict[str, Any] = {"_metadata": [
+            MetadataRecord(*json.loads(self._blob("meta", meta_idx)), self._blob("files", meta_idx))
+            if self.has_metadata(meta_idx) else None
+            for meta_idx in range(self.metadata_count)
+        ]}
+        for map_name in SINGLE_MAPS:
+            view = self.view(map_name)
+            index[map_name] = {view.key_at(position): view._values[position] for position in range(len(view))}
+        view = self.view(INSTALL_DIR_MAP)
+        index[INSTALL_DIR_MAP] = {
+            view.key_at(position): {"_meta": view._values[position], "launch": self.launch(position)}
+            for position in range(len(view))
+        }
+        return index
+
+    def close(self) -> None:
+        self._arrays.clear()
+        self._sections.clear()
+        try:
+            self._buffer.release()
+            self._mm.close()
+        except BufferError:
+            # Views handed out to callers still reference the map; it is
+            # unmapped when the last of them is garbage collected.
+            pass
+
+class IndexRecord(Mapping):
+    __slots__ = ("_index", "_meta_idx", "_launch_position", "_fields", "_files", "_launch")
+
+    def __init__(self, index: BinaryIndex, meta_idx: int, launch_position: Optional[int] = None):
+        self._index = index
+        self._meta_idx = meta_idx
+        self._launch_position = launch_position
+        self._fields = None
+        self._files = None
+        self._launch = None
+
+    def _keys(self) -> Tuple[str, ...]:
+        if self._launch_position is None:
+            return META_FIELDS + ("files",)
+        return META_FIELDS + ("files", "launch")
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "files":
+            if self._files is None:
+                self._files = self._index.files(self._meta_idx)
+            return self._files
+        if key == "launch" and self._launch_position is not None:
+            if self._launch is None:
+                self._launch = self._index.launch(self._launch_position)
+            return self._launch
+        if key not in META_FIELDS:
+            raise KeyError(key)
+        if self._fields is None:
+            self._fields = self._index.metadata(self._meta_idx)
+        return self._fields[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+    def __repr__(self) -> str:
+        return f"IndexRecord({self._meta_idx}, {self['game_name']!r})"
+
+class IndexView(Mapping):
+    def __init__(self, index: BinaryIndex, map_name: str):
+        self._index = index
+        self._map_name = map_name
+        self._key_offsets = index._u32(f"{map_name}.keys.off")
+        self._keys = index._section(f"{map_name}.keys")
+        self._values = index._u32(f"{map_name}.vals")
+        self._count = len(self._key_offsets) - 1
+
+    def _key_at(self, position: int) -> bytes:
+        return bytes(self._keys[self._key_offsets[position]:self._key_offsets[position + 1]])
+
+    def key_at(self, position: int) -> str:
+        return self._key_at(position).decode("utf-8")
+
+    def _bisect(self, target: bytes) -> int:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, key: Any) -> int:
+        if not isinstance(key, str):
+            return -1
+        target = key.encode("utf-8")
+        low = self._bisect(target)
+        if low < self._count and self._key_at(low) == target:
+            return low
+        return -1
+
+    def positions_of(self, values: Set[int]) -> List[int]:
+        # Positions whose value is one of the given metadata indexes.
+        return [position for position, value in enumerate(self._values) if value in values]
+
+    def _value_at(self, position: int) -> Any:
+        if self._map_name == INSTALL_DIR_MAP:
+            return self._index.record(self._values[position], position)
+        if self._map_name in POSTING_MAPS:
+            start, count = self._values[2 * position], self._values[2 * position + 1]
+            return self._index._u32(f"{self._map_name}.postings")[start:start + count]
+        return self._index.record(self._values[position])
+
+    def __getitem__(self, key: str) -> Any:
+        position = self._find(key)
+        if position < 0:
+            raise KeyError(key)
+        return self._value_at(position)
+
+    def __contains__(self, key: object) -> bool:
+        return self._find(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(self._count):
+            yield self._key_at(position).decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._count
+
+def is_current_binary_index(file_path: str) -> bool:
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return False
+    if len(header) < HEADER.size:
+        return False
+    magic, version, _ = HEADER.unpack(header)
+    return magic == MAGIC and version == FORMAT_VERSION
+
+def load_binary_index(file_path: str) -> Optional[BinaryIndex]:
+    if not os.path.exists(file_path):
+        return None
+    try:
+        return BinaryIndex(file_path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading index from {file_path}: {e}")
+        return None
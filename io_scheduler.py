@@ -0,0 +1,226 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import DEVICE_IO_DEFAULT_LIMIT, DEVICE_IO_LIMITS, DEVICE_IO_MAX_LIMIT
+
+logger = logging.getLogger("no_steam_to_steam.log")
+
+# Limits move once per window of at least THROUGHPUT_MIN_WINDOW tasks (two per
+# slot in use) spanning THROUGHPUT_WINDOW_SPAN times the longest recent task,
+# so fast tasks finishing around slow ones do not inflate a window. A step up that paid off in proportion is followed by a 50%
+# step, any other healthy window by one slot. A limit backs off by 30% when the
+# last step up cost more than THROUGHPUT_DROP of the previous window's
+# throughput, or throughput fell below THROUGHPUT_COLLAPSE of the best window
+# since the last back-off; the best decays by THROUGHPUT_DECAY per window so
+# one fast stretch does not pin it for the rest of the process.
+THROUGHPUT_MIN_WINDOW = 24
+THROUGHPUT_WINDOW_SPAN = 2.0
+THROUGHPUT_DROP = 0.75
+THROUGHPUT_COLLAPSE = 0.5
+THROUGHPUT_DECAY = 0.9
+
+class ThroughputWindow:
+    # Congestion signal from completed tasks per second of busy time, over
+    # windows of many tasks. Per-task latency is no signal here: a folder walk
+    # and a single file hash differ by orders of magnitude without any
+    # contention. Time with nothing in flight is not counted.
+    def __init__(self):
+        self.in_flight = 0
+        self.busy = 0.0
+        self.busy_since: Optional[float] = None
+        self.completed = 0
+        self.longest = 0.0
+        self.previous_longest = 0.0
+        self.best: Optional[float] = None
+        self.previous: Optional[Tuple[int, float]] = None
+
+    def started(self) -> None:
+        if self.in_flight == 0:
+            self.busy_since = time.monotonic()
+        self.in_flight += 1
+
+    def finished(self, limit: float, elapsed: float, counted: bool = True) -> Optional[float]:
+        # None until a window is full, then the next limit (before clamping).
+        now = time.monotonic()
+        self.in_flight -= 1
+        if self.in_flight == 0 and self.busy_since is not None:
+            self.busy += now - self.busy_since
+            self.busy_since = None
+        if not counted:
+            return None
+        self.completed += 1
+        self.longest = max(self.longest, elapsed)
+        busy = self.busy + (now - self.busy_since if self.busy_since is not None else 0.0)
+        if (self.completed < max(THROUGHPUT_MIN_WINDOW, 2 * int(limit))
+                or busy < THROUGHPUT_WINDOW_SPAN * max(self.longest, self.previous_longest)):
+            return None
+
+        throughput = self.completed / max(busy, 1e-9)
+        self.completed = 0
+        self.busy = 0.0
+        self.previous_longest = self.longest
+        self.longest = 0.0
+        if self.busy_since is not None:
+            self.busy_since = now
+
+        next_limit = limit + 1
+        if self.previous is not None:
+            previous_limit, previous_throughput = self.previous
+            grew = int(limit) > previous_limit
+            if (throughput < self.best * THROUGHPUT_COLLAPSE
+                    or (grew and throughput < previous_throughput * THROUGHPUT_DROP)):
+                next_limit = limit * 0.7
+            elif grew and throughput >= previous_throughput * (1 + 0.5 * (int(limit) - previous_limit) / previous_limit):
+                next_limit = limit * 1.5
+        self.previous = (int(limit), throughput)
+        if self.best is None or next_limit < limit:
+            # Throughput at a lower limit is judged against what that limit achieves.
+            self.best = throughput
+        else:
+            self.best = max(self.best * THROUGHPUT_DECAY, throughput)
+        return next_limit
+
+class DeviceLimiter:
+    # Concurrency limit for one device. Configured limits are fixed; the others
+    # follow the throughput of windows of tasks (see ThroughputWindow).
+    def __init__(self, limit: int, max_limit: int, adaptive: bool):
+        self.limit = float(limit)
+        self.max_limit = max_limit
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.window = ThroughputWindow()
+        self.latency: Optional[float] = None
+        self.completed = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= max(1, int(self.limit)):
+            return False
+        self.in_flight += 1
+        self.window.started()
+        return True
+
+    def release(self, elapsed: float) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+        self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+        next_limit = self.window.finished(self.limit, elapsed)
+        if self.adaptive and next_limit is not None:
+            self.limit = min(float(self.max_limit), max(1.0, next_limit))
+
+class DeviceScheduler:
+    # Runs I/O-bound tasks on a shared pool while keeping a separate queue and
+    # concurrency limit per device (st_dev), so a slow SD card cannot take the
+    # workers an NVMe library could be using. Limits persist between runs.
+    def __init__(self, configured_limits: Optional[Dict[str, int]] = None,
+                 default_limit: int = DEVICE_IO_DEFAULT_LIMIT, max_limit: int = DEVICE_IO_MAX_LIMIT):
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.lock = threading.Lock()
+        self.limiters: Dict[int, DeviceLimiter] = {}
+        # Queue pumps of every run in progress, so a slot freed by one run can
+        # be taken by another run waiting on the same device.
+        self._pumps: Dict[Optional[int], List[Callable[[], None]]] = {}
+        self.configured: Dict[int, int] = {}
+        for path, limit in (DEVICE_IO_LIMITS if configured_limits is None else configured_limits).items():
+            device = self.device_of(path)
+            if device is not None:
+                self.configured[device] = limit
+
+    @staticmethod
+    def device_of(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            return None
+
+    def _limiter(self, device: Optional[int]) -> DeviceLimiter:
+        limiter = self.limiters.get(device)
+        if limiter is None:
+            if device in self.configured:
+                limiter = DeviceLimiter(self.configured[device], self.configured[device], adaptive=False)
+            else:
+                limiter = DeviceLimiter(self.default_limit, self.max_limit, adaptive=True)
+            self.limiters[device] = limiter
+        return limiter
+
+    def run(self, tasks: Iterable[Tuple[str, Callable[[], Any]]], max_workers: Optional[int] = None) -> List[Any]:
+        # tasks are (path, callable) pairs; results come back in task order.
+        queues: Dict[Optional[int], deque] = {}
+        devices: Dict[str, Optional[int]] = {}
+        count = 0
+        for path, task in tasks:
+            device = devices[path] if path in devices else devices.setdefault(path, self.device_of(path))
+            queues.setdefault(device, deque()).append((count, task))
+            count += 1
+        results: List[Any] = [None] * count
+        if not count:
+            return results
+
+        errors: List[BaseException] = []
+        remaining = [count]
+        finished = threading.Event()
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def pump(device: Optional[int]) -> Callable[[], None]:
+                def dispatch() -> None:
+                    # Called with self.lock held.
+                    limiter = self._limiter(device)
+                    queue = queues[device]
+                    while queue and limiter.try_acquire():
+                        position, task = queue.popleft()
+                        executor.submit(run_task, device, position, task)
+                return dispatch
+
+            def run_task(device: Optional[int], position: int, task: Callable[[], Any]) -> None:
+                start = time.perf_counter()
+                try:
+                    results[position] = task()
+                except BaseException as e:
+                    errors.append(e)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    with self.lock:
+                        self._limiter(device).release(elapsed)
+                        for dispatch in list(self._pumps.get(device, ())):
+                            dispatch()
+                        remaining[0] -= 1
+                        if not remaining[0]:
+                            finished.set()
+
+            pumps = {device: pump(device) for device in queues}
+            with self.lock:
+                for device, dispatch in pumps.items():
+                    self._pumps.setdefault(device, []).append(dispatch)
+                    dispatch()
+            finished.wait()
+            with self.lock:
+                for device, dispatch in pumps.items():
+                    self._pumps[device].remove(dispatch)
+
+        if errors:
+            raise errors[0]
+        return results
+
+    def describe(self) -> str:
+        with self.lock:
+            return ", ".join(
+                f"dev {device}: limit {int(limiter.limit)}"
+                + (f", {limiter.latency * 1000:.0f} ms/task" if limiter.latency is not None else "")
+                for device, limiter in self.limiters.items() if limiter.completed
+            )
+
+_shared_scheduler: Optional[DeviceScheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+def get_io_scheduler() -> DeviceScheduler:
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = DeviceScheduler()
+        return _shared_scheduler
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import yaml
+
+from config import HEROIC_CONFIG_DIRS, LUTRIS_CONFIG_DIRS, LUTRIS_DATA_DIRS
+
+logger = logging.getLogger("no_steam_to_steam.log")
+
+class LauncherRecord(NamedTuple):
+    install_path: str
+    title: str
+    exe_path: str  # Absolute, or "" when the launcher does not record one.
+    launcher: str
+    app_id: str
+    prefix: str = ""
+
+def _load_json(file_path: str) -> Optional[object]:
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError, UnicodeDecodeError) as e:
+        logger.error(f"Error reading launcher database {file_path}: {str(e)}")
+        return None
+
+def _resolve_exe(install_path: str, executable: str) -> str:
+    if not executable:
+        return ""
+    exe_path = executable if os.path.isabs(executable) else os.path.join(install_path, executable)
+    return os.path.normpath(exe_path) if os.path.isfile(exe_path) else ""
+
+def _gog_info_exe(install_path: str, gog_id: str) -> str:
+    # Heroic leaves "executable" empty for most GOG installs; the primary play
+    # task in the game's own goggame-<id>.info is one file read away.
+    info = _load_json(os.path.join(install_path, f"goggame-{gog_id}.info"))
+    if not isinstance(info, dict):
+        return ""
+    task = next((t for t in info.get('playTasks', []) if t.get('isPrimary')), None)
+    return _resolve_exe(install_path, task.get('path', "")) if task else ""
+
+def _heroic_prefix(config_dir: str, app_name: str) -> str:
+    data = _load_json(os.path.join(config_dir, "GamesConfig", f"{app_name}.json"))
+    if not isinstance(data, dict):
+        return ""
+    return (data.get(app_name) or {}).get("winePrefix", "") or ""
+
+def _heroic_gog_titles(config_dir: str) -> Dict[str, str]:
+    titles = {}
+    for library_file in (os.path.join("store_cache", "gog_library.json"), os.path.join("gog_store", "library.json")):
+        data = _load_json(os.path.join(config_dir, library_file))
+        if isinstance(data, dict):
+            for game in data.get("games", []):
+                if game.get("app_name") and game.get("title"):
+                    titles[str(game["app_name"])] = game["title"]
+    return titles
+
+def import_heroic(config_dir: str) -> Iterator[LauncherRecord]:
+    gog_installed = _load_json(os.path.join(config_dir, "gog_store", "installed.json"))
+    if isinstance(gog_installed, dict):
+        titles = _heroic_gog_titles(config_dir)
+        for game in gog_installed.get("installed", []):
+            install_path = game.get("install_path")
+            app_name = str(game.get("appName", ""))
+            if not install_path or not app_name or game.get("is_dlc"):
+                continue
+            exe_path = (_resolve_exe(install_path, game.get("executable", ""))
+                        or _gog_info_exe(install_path, app_name))
+            yield LauncherRecord(install_path, titles.get(app_name, os.path.basename(install_path)), exe_path,
+                                 "heroic-gog", app_name, _heroic_prefix(config_dir, app_name))
+
+    epic_installed = _load_json(os.path.join(config_dir, "legendaryConfig", "legendary", "installed.json"))
+    if isinstance(epic_installed, dict):
+        for app_name, game in epic_installed.items():
+            if not isinstance(game, dict) or not game.get("install_path") or game.get("is_dlc"):
+                continue
+            install_path = game["install_path"]
+            yield LauncherRecord(install_path, game.get("title") or os.path.basename(install_path),
+                                 _resolve_exe(install_path, game.get("executable", "")),
+                                 "heroic-epic", app_name, _heroic_prefix(config_dir, app_name))
+
+    for library_dir in ("sideload_apps", "sideloads_apps"):
+        sideloads = _load_json(os.path.join(config_dir, library_dir, "library.json"))
+        if not isinstance(sideloads, dict):
+            continue
+        for game in sideloads.get("games", []):
+            app_name = game.get("app_name", "")
+            executable = (game.get("install") or {}).get("executable", "")
+            install_path = game.get("folder_name") or (os.path.dirname(executable) if executable else "")
+            if not install_path or not app_name:
+                continue
+            yield LauncherRecord(install_path, game.get("title") or os.path.basename(install_path),
+                                 _resolve_exe(install_path, executable),
+                                 "heroic-sideload", app_name, _heroic_prefix(config_dir, app_name))
+
+def _lutris_game_config(configpath: str) -> Dict:
+    for config_dir in LUTRIS_CONFIG_DIRS:
+        config_file = os.path.join(config_dir, "games", f"{configpath}.yml")
+        if os.path.exists(config_file):
+            try:
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    return yaml.safe_load(f) or {}
+            except (yaml.YAMLError, IOError, UnicodeDecodeError) as e:
+                logger.error(f"Error reading Lutris game config {config_file}: {str(e)}")
+    return {}
+
+def import_lutris(data_dir: str) -> Iterator[LauncherRecord]:
+    database = os.path.join(data_dir, "pga.db")
+    if not os.path.exists(database):
+        return
+    try:
+        connection = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+        try:
+            rows = connection.execute(
+                "SELECT name, slug, directory, configpath FROM games WHERE installed = 1"
+            ).fetchall()
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading Lutris database {database}: {str(e)}")
+        return
+
+    for name, slug, directory, configpath in rows:
+        game_config = (_lutris_game_config(configpath) if configpath else {}).get("game") or {}
+        install_path = directory or game_config.get("working_dir", "")
+        executable = game_config.get("exe", "")
+        if not install_path and executable and os.path.isabs(executable):
+            install_path = os.path.dirname(executable)
+        if not install_path:
+            continue
+        yield LauncherRecord(install_path, name or slug, _resolve_exe(install_path, executable),
+                             "lutris", slug or "", game_config.get("prefix", "") or "")
+
+def load_launcher_records() -> List[LauncherRecord]:
+    records = []
+    for config_dir in HEROIC_CONFIG_DIRS:
+        if os.path.isdir(config_dir):
+            records.extend(import_heroic(config_dir))
+    for data_dir in LUTRIS_DATA_DIRS:
+        if os.path.isdir(data_dir):
+            records.extend(import_lutris(data_dir))
+    return records
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+from config import LUTRIS_CACHE_FILE, LUTRIS_CACHE_MAX_AGE, LUTRIS_CACHE_TTL, LUTRIS_NEGATIVE_CACHE_TTL
+
+logger = logging.getLogger("no_steam_to_steam.log")
+
+class CachedResponse(NamedTuple):
+    data: Any  # Parsed JSON body, or None for a negative entry.
+    negative: bool
+    etag: str
+    last_modified: str
+    fresh: bool
+
+def normalize_url(url: str) -> str:
+    # Lutris lookups are case-insensitive, so "Hollow Knight" and "hollow  knight"
+    # share one entry.
+    parts = urlsplit(url)
+    query = sorted((key, " ".join(value.split()).lower()) for key, value in parse_qsl(parts.query))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"),
+                       urlencode(query, quote_via=quote), ""))
+
+# On-disk cache of Lutris API responses keyed by normalized URL. Fresh entries
+# are served without a request; stale ones keep their ETag/Last-Modified so the
+# next request can be conditional. 404s and empty searches are negative entries.
+class LutrisResponseCache:
+    VERSION = 1
+
+    def __init__(self, cache_file: str = LUTRIS_CACHE_FILE, ttl: float = LUTRIS_CACHE_TTL,
+                 negative_ttl: float = LUTRIS_NEGATIVE_CACHE_TTL, max_age: float = LUTRIS_CACHE_MAX_AGE):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0}
+        self.connection: Optional[sqlite3.Connection] = None
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            self.connection = sqlite3.connect(cache_file, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS responses")
+                self.connection.execute(f"PRAGMA user_version = {self.VERSION}")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, body TEXT, negative INTEGER, "
+                "etag TEXT, last_modified TEXT, fetched REAL)"
+            )
+            self.connection.execute("DELETE FROM responses WHERE fetched < ?", (time.time() - max_age,))
+            self.connection.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error opening Lutris cache {cache_file}: {str(e)}")
+            self.close()
+
+    def lookup(self, url: str) -> Optional[CachedResponse]:
+        if self.connection is None:
+            return None
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT body, negative, etag, last_modified, fetched FROM responses WHERE url = ?",
+                    (normalize_url(url),)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading Lutris cache: {str(e)}")
+            return None
+        if row is None:
+            return None
+
+        body, negative, etag, last_modified, fetched = row
+        age = time.time() - fetched
+        try:
+            data = None if negative else json.loads(body)
+        except json.JSONDecodeError:
+            return None
+        return CachedResponse(data, bool(negative), etag or "", last_modified or "",
+                              age < (self.negative_ttl if negative else self.ttl))
+
+    def store(self, url: str, data: Any, negative: bool = False, etag: str = "", last_modified: str = "") -> None:
+        if self.connection is None:
+            return
+        try:
+            with self.lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (normalize_url(url), None if negative else json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+                     int(negative), etag, last_modified, time.time())
+                )
+                self.connection.commit()
+                self.stats['stores'] += 1
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"Error writing Lutris cache: {str(e)}")
+
+    def touch(self, url: str) -> None:
+        # A 304: the stored body is current again.
+        if self.connection is None:
+            return
+        try:
+            with self.lock:
+                self.connection.execute("UPDATE responses SET fetched = ? WHERE url = ?",
+                                        (time.time(), normalize_url(url)))
+                self.connection.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing Lutris cache: {str(e)}")
+
+    def record(self, outcome: str) -> None:
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def describe_stats(self) -> str:
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['negative_hits'] + stats['revalidated'] + stats['misses']
+        hit_rate = 100 * (stats['hits'] + stats['negative_hits']) / lookups if lookups else 0.0
+        return (f"{lookups} lookups, {hit_rate:.1f}% hits ({stats['negative_hits']} negative), "
+                f"{stats['revalidated']} revalidated, {stats['misses']} fetched, {stats['stores']} stored")
+
+    def close(self) -> None:
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
@@ -1,25 +1,126 @@
+import asyncio
 import requests
-from typing import Dict, Any, Optional, List
+from typing import Deque, Dict, Any, Optional, List, Set, Tuple
 from urllib.parse import quote
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from config import LUTRIS_REFRESH_AGE
+from lutris_cache import LutrisResponseCache, normalize_url
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("no_steam_to_steam.log")
 
+class TokenBucket:
+    # Allows `rate` requests per second on average, in bursts of up to `burst`.
+    # pause() empties the bucket until a Retry-After has passed.
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def pause(self, seconds: float) -> None:
+        self.tokens = 0.0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now >= self.updated:
+                self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+            await asyncio.sleep(max(self.updated - now, 0) + (1 - self.tokens) / self.rate)
+
+class AdaptiveConcurrency:
+    # AIMD limit on requests in flight: one more slot per window of successful
+    # requests, halved on a 429, a timeout or a connection error. Latency is
+    # not used: search and id lookups vary too much to read congestion from,
+    # and the token bucket already bounds the request rate.
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.backoffs = 0
+        self.waiters: Deque["asyncio.Future[None]"] = deque()
+
+    def _wake(self) -> None:
+        free = max(self.minimum, int(self.limit)) - self.in_flight
+        while free > 0 and self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def acquire(self) -> None:
+        while self.in_flight >= max(self.minimum, int(self.limit)):
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # A wake-up this waiter can no longer use goes to the next one.
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+        self.in_flight += 1
+
+    def release(self, sent: bool, congested: bool) -> None:
+        # Synchronous so it is safe in a finally block of a cancelled task.
+        # sent is False when the slot was given up before a request went out.
+        self.in_flight -= 1
+        if sent and congested:
+            self.limit = max(float(self.minimum), self.limit / 2)
+            self.backoffs += 1
+        elif sent:
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+        self._wake()
+
 class LutrisDataEnhancer:
     LUTRIS_API_URL = "https://lutris.net/api/games"
     REQUEST_TIMEOUT = 6
+    # Upper bound for one HTTP call, urllib3 retries included, counted from when
+    # it holds a concurrency slot and a rate-limit token.
+    REQUEST_DEADLINE = 20
     MAX_RETRIES = 3
     BACKOFF_FACTOR = 1
     STATUS_FORCELIST = [500, 502, 503, 504]
     POOL_SCALING_FACTOR = 4
+    RATE_LIMIT = 5.0
+    RATE_BURST = 10
+    INITIAL_CONCURRENCY = 4
+    MAX_CONCURRENCY = 16
+    SEARCH_STAGES = [
+        ("lutris_id", "lutris_id"),
+        ("steam_id", "steamid"),
+        ("gog_id", "gogid"),
+        ("game_name", "search")
+    ]
 
-    def __init__(self, associate_data: Dict[str, Dict]):
+    def __init__(self, associate_data: Dict[str, Dict], cache: Optional[LutrisResponseCache] = None,
+                 existing_data: Optional[Dict[str, Dict]] = None, refresh_age: float = LUTRIS_REFRESH_AGE):
         self.associate_data = associate_data
+        # Current games.json entries; folders already enriched there are not looked up again.
+        self.existing_data = existing_data or {}
+        self.refresh_age = refresh_age
         self.session = self._create_session()
+        self._owns_cache = cache is None
+        self.cache = cache if cache is not None else LutrisResponseCache()
+        self.stats = {'requests': 0, 'throttled': 0, 'timeouts': 0, 'coalesced': 0, 'skipped': 0}
+        self.queries: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+        # Queries that got no answer (deadline, connection or server error), as opposed to "not found".
+        self.failed_queries: Set[str] = set()
+        # Folder -> search stage that settled it, for tuning SEARCH_STAGES.
+        self.resolved_by: Dict[str, str] = {}
 
     def _create_session(self) -> requests.Session:
         session = requests.Session()
@@ -28,7 +129,9 @@ class LutrisDataEnhancer:
             total=self.MAX_RETRIES,
             backoff_factor=self.BACKOFF_FACTOR,
             status_forcelist=self.STATUS_FORCELIST,
-            allowed_methods=["HEAD", "GET", "OPTIONS"]
+            allowed_methods=["HEAD", "GET", "OPTIONS"],
+            # 429s come back to _fetch so the token bucket can pause every request, not just one thread.
+            respect_retry_after_header=False
         )
         
         adapter = HTTPAdapter(
@@ -48,33 +151,111 @@ class LutrisDataEnhancer:
         
         return session
 
-    def _query_lutris_exact_match(self, search_term: str, search_by: str) -> Optional[Dict[str, Any]]:
+    def _retry_after(self, response: requests.Response, attempt: int) -> float:
         try:
-            search_term = str(search_term).strip()
-            if not search_term:
-                logger.debug("Empty search term ignored")
-                return None
+            return max(0.0, float(response.headers.get("Retry-After", "")))
+        except ValueError:
+            return self.BACKOFF_FACTOR * 2 ** attempt
 
-            if search_by == "lutris_id":
-                url = f"{self.LUTRIS_API_URL}/{quote(search_term)}"
-            else:
-                url = f"{self.LUTRIS_API_URL}?search={quote(search_term)}"
+    async def _fetch(self, url: str, headers: Dict[str, str]) -> requests.Response:
+        # One GET through the token bucket and the AIMD limit; 429s wait out
+        # Retry-After and are retried up to MAX_RETRIES times.
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self.concurrency.acquire()
+            sent = False
+            congested = False
+            try:
+                await self.bucket.acquire()
+                sent = True
+                response = await asyncio.wait_for(loop.run_in_executor(
+                    self.executor, partial(self.session.get, url, timeout=self.REQUEST_TIMEOUT, headers=headers)
+                ), self.REQUEST_DEADLINE)
+                congested = response.status_code == 429
+            except (asyncio.TimeoutError, requests.exceptions.RequestException):
+                congested = True
+                raise
+            finally:
+                self.concurrency.release(sent, congested)
+            self.stats['requests'] += 1
+            if response.status_code != 429 or attempt == self.MAX_RETRIES:
+                return response
+            self.stats['throttled'] += 1
+            self.bucket.pause(self._retry_after(response, attempt))
+        return response
+
+    async def _query_lutris_exact_match(self, search_term: str, search_by: str) -> Optional[Dict[str, Any]]:
+        # Single flight: games sharing a steam_id, gog_id or name (editions, DLC
+        # folders, the same game in two sync folders) await one query per run.
+        search_term = str(search_term).strip()
+        if not search_term:
+            logger.debug("Empty search term ignored")
+            return None
+
+        url = self._query_url(search_term, search_by)
+        key = normalize_url(url)
+        query = self.queries.get(key)
+        if query is None:
+            query = self.queries[key] = asyncio.ensure_future(self._run_query(url, key, search_term, search_by))
+        elif not query.done():
+            self.stats['coalesced'] += 1
+        elif key not in self.failed_queries and not query.cancelled():
+            # Already answered this run: served from memory, like a cache hit.
+            self.cache.record('hits' if query.result() is not None else 'negative_hits')
+        # Shielded so a waiter being cancelled does not cancel the shared query.
+        return await asyncio.shield(query)
+
+    def _query_url(self, search_term: str, search_by: str) -> str:
+        if search_by == "lutris_id":
+            return f"{self.LUTRIS_API_URL}/{quote(search_term)}"
+        return f"{self.LUTRIS_API_URL}?search={quote(search_term)}"
+
+    async def _run_query(self, url: str, key: str, search_term: str, search_by: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = self.cache.lookup(url)
+            if cached is not None and cached.fresh:
+                self.cache.record('negative_hits' if cached.negative else 'hits')
+                return cached.data
+
+            headers = {}
+            if cached is not None:
+                if cached.etag:
+                    headers["If-None-Match"] = cached.etag
+                if cached.last_modified:
+                    headers["If-Modified-Since"] = cached.last_modified
 
             logger.debug(f"Querying Lutris: {url}")
-            response = self.session.get(url, timeout=self.REQUEST_TIMEOUT)
+            response = await self._fetch(url, headers)
+            if response.status_code == 304 and cached is not None:
+                self.cache.record('revalidated')
+                self.cache.touch(url)
+                return cached.data
+
+            self.cache.record('misses')
             response.raise_for_status()
             data = response.json()
 
-            return data
+            negative = search_by != "lutris_id" and isinstance(data, dict) and data.get("results") == []
+            self.cache.store(url, data, negative, response.headers.get("ETag", ""),
+                             response.headers.get("Last-Modified", ""))
+            return None if negative else data
 
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            self.failed_queries.add(key)
+            logger.warning(f"Lutris query for {search_term} exceeded {self.REQUEST_DEADLINE}s")
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 404:
                 logger.debug(f"Not found in Lutris: {search_term}")
+                self.cache.store(url, None, negative=True)
             else:
+                self.failed_queries.add(key)
                 logger.warning(f"HTTP error ({e.response.status_code}) when querying Lutris: {e}")
         except requests.exceptions.RequestException as e:
+            self.failed_queries.add(key)
             logger.warning(f"Connection error when querying Lutris: {e}")
         except Exception as e:
+            self.failed_queries.add(key)
             logger.error(f"Unexpected error when querying {search_term}: {str(e)}")
 
         return None
@@ -109,45 +290,50 @@ class LutrisDataEnhancer:
             bool(x.get("background_image"))
         ))
 
-    def _get_lutris_data(self, game_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        search_order = [
-            ("lutris_id", "lutris_id"),
-            ("steam_id", "steamid"),
-            ("gog_id", "gogid"),
-            ("game_name", "search")
+    def _stage_candidates(self, search_by: str, search_term: str, response_data: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if search_by == "lutris_id":
+            return [response_data] if isinstance(response_data, dict) else []
+        if not isinstance(response_data, dict) or not isinstance(response_data.get("results"), list):
+            return []
+
+        if search_by in {"steamid", "gogid"}:
+            service = search_by.replace("id", "")
+            return [
+                r for r in response_data["results"]
+                if any(
+                    p.get("service") == service and str(p.get("slug")) == search_term
+                    for p in r.get("provider_games", [])
+                )
+            ]
+        lower_search = search_term.lower()
+        return [
+            r for r in response_data["results"]
+            if r.get("name", "").strip().lower() == lower_search
         ]
 
+    async def _get_lutris_data(self, game_data: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], str]:
+        # Stages run from most to least specific and stop at the first one that
+        # yields exactly one game while nothing ambiguous came before it; later
+        # queries would only add candidates _find_best_match ranks below it.
+        # Returns the match and what settled it: the stage's field,
+        # "best_match" when several candidates had to be ranked, "none" when
+        # Lutris knows no such game, or "failed" when it could not be asked.
         all_candidates = []
-        
-        for field, search_by in search_order:
-            if game_data.get(field):
-                search_term = str(game_data[field]).strip()
-                response_data = self._query_lutris_exact_match(search_term, search_by)
-                
-                if search_by == "lutris_id":
-                    if isinstance(response_data, dict):
-                        all_candidates.append(response_data)
-                else:
-                    if isinstance(response_data, dict) and isinstance(response_data.get("results"), list):
-                        if search_by in {"steamid", "gogid"}:
-                            service = search_by.replace("id", "")
-                            exact_matches = [
-                                r for r in response_data["results"]
-                                if any(
-                                    p.get("service") == service and str(p.get("slug")) == search_term
-                                    for p in r.get("provider_games", [])
-                                )
-                            ]
-                        else:  
-                            lower_search = search_term.lower()
-                            exact_matches = [
-                                r for r in response_data["results"]
-                                if r.get("name", "").strip().lower() == lower_search
-                            ]
-                        
-                        all_candidates.extend(exact_matches)
-        
-        return self._find_best_match(game_data, all_candidates) if all_candidates else None
+        failed = False
+        for field, search_by in self.SEARCH_STAGES:
+            if not game_data.get(field):
+                continue
+            search_term = str(game_data[field]).strip()
+            response_data = await self._query_lutris_exact_match(search_term, search_by)
+            failed = failed or normalize_url(self._query_url(search_term, search_by)) in self.failed_queries
+            candidates = self._stage_candidates(search_by, search_term, response_data)
+            if not all_candidates and len({c.get("slug") or id(c) for c in candidates}) == 1:
+                return candidates[0], field
+            all_candidates.extend(candidates)
+
+        if not all_candidates:
+            return None, "failed" if failed else "none"
+        return self._find_best_match(game_data, all_candidates), "best_match"
 
     def _merge_providers(self, original_providers: List[Dict], lutris_providers: List[Dict]) -> List[Dict]:
         merged = []
@@ -249,37 +435,87 @@ class LutrisDataEnhancer:
             "providers": providers
         }
 
-    def _process_single_game(self, folder: str, game_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _already_enriched(self, folder: str, game_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        existing = self.existing_data.get(folder)
+        if not existing:
+            return None
+        # A different exe is replaced wholesale by GameDataManager.update_data, so it needs fresh data.
+        if existing.get("exe_path") and game_data.get("exe_path") and existing["exe_path"] != game_data["exe_path"]:
+            return None
+        # Partial and "not found" answers are stamped too; only their age decides.
+        if time.time() - existing.get("lutris_updated", 0) > self.refresh_age:
+            return None
+        return existing
+
+    async def _process_single_game(self, folder: str, game_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        existing = self._already_enriched(folder, game_data)
+        if existing is not None:
+            self.stats['skipped'] += 1
+            return folder, existing
+
         try:
-            lutris_data = self._get_lutris_data(game_data)
+            lutris_data, self.resolved_by[folder] = await self._get_lutris_data(game_data)
             processed_data = self._process_lutris_response(lutris_data, game_data)
         except Exception as e:
             logger.warning(f"Error enhancing data for {folder}, returning base data: {str(e)}")
+            self.resolved_by[folder] = "error"
             processed_data = self._get_empty_response_structure(game_data)
-        
-        return folder, {
+
+        result = {
             "name": game_data.get("game_name", ""),
             "exe_path": game_data.get("exe_path", ""),
             "files": game_data.get("files", {}),
             "user_selected": False,
             **processed_data
         }
+        # Games Lutris could not be asked about are retried on the next run.
+        if self.resolved_by[folder] not in ("failed", "error"):
+            result["lutris_updated"] = int(time.time())
+        return folder, result
+
+    def enhance_with_lutris_data(self, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        return asyncio.run(self.enhance_async(max_workers))
 
-    def enhance_with_lutris_data(self) -> Dict[str, Any]:
+    async def enhance_async(self, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        # max_workers caps the requests in flight; the AIMD limit moves below it.
+        max_concurrency = max_workers or self.MAX_CONCURRENCY
+        self.bucket = TokenBucket(self.RATE_LIMIT, self.RATE_BURST)
+        self.concurrency = AdaptiveConcurrency(min(self.INITIAL_CONCURRENCY, max_concurrency), 1, max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.queries = {}
+        self.failed_queries = set()
+        self.resolved_by = {}
         enhanced_data = {}
-        
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(self._process_single_game, folder, game_data): folder
-                for folder, game_data in self.associate_data.items()
-            }
-            
-            for future in as_completed(futures):
-                try:
-                    folder, result = future.result()
-                    enhanced_data[folder] = result
-                except Exception as e:
-                    logger.error(f"Error processing game {folder}: {str(e)}")
+        # Games waiting here have no request started, so nothing of theirs is on a deadline yet.
+        games_in_flight = asyncio.Semaphore(max_concurrency)
+
+        async def process(folder: str, game_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+            async with games_in_flight:
+                return await self._process_single_game(folder, game_data)
+
+        try:
+            results = await asyncio.gather(*(
+                process(folder, game_data) for folder, game_data in self.associate_data.items()
+            ), return_exceptions=True)
+        finally:
+            # Requests abandoned at their deadline are not waited for.
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+        for folder, result in zip(self.associate_data, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error processing game {folder}: {str(result)}")
+                continue
+            enhanced_data[folder] = result[1]
         
         self.session.close()
+        logger.info(f"Lutris requests: {self.stats['requests']} ({self.stats['throttled']} rate limited, "
+                    f"{self.stats['timeouts']} past deadline), concurrency limit {int(self.concurrency.limit)} "
+                    f"after {self.concurrency.backoffs} backoffs; {self.stats['coalesced']} duplicate queries "
+                    f"shared instead of sent, {self.stats['skipped']} games already enriched")
+        if self.resolved_by:
+            stages = Counter(self.resolved_by.values())
+            logger.info("Lutris matches by stage: " + ", ".join(f"{stage} {count}" for stage, count in stages.most_common()))
+        logger.info(f"Lutris cache: {self.cache.describe_stats()}")
+        if self._owns_cache:
+            self.cache.close()
         return enhanced_data
@@ -0,0 +1,84 @@
+import hashlib
+import os
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config import MANIFEST_STATE_FILE
+from utils import load_json_file, save_json_file
+
+# Index changes kept for the scan cache to walk; older cached matches are re-identified.
+INDEX_CHANGE_HISTORY = 20
+
+def _section(key: str, lines: List[bytes]) -> Tuple[str, str, bytes]:
+    raw = b"".join(lines)
+    return key, hashlib.blake2b(raw, digest_size=16).hexdigest(), raw
+
+def iter_manifest_sections(file_path: str) -> Iterator[Tuple[str, str, bytes]]:
+    # Splits the manifest at its top-level keys without parsing it and yields
+    # (key line, content hash, raw section) for every game.
+    key = None
+    lines: List[bytes] = []
+    with open(file_path, 'rb') as f:
+        for line in f:
+            if line[:1] not in b" \t#\r\n" and not line.startswith((b"---", b"...")):
+                if key is not None:
+                    yield _section(key, lines)
+                key = line.rstrip(b"\r\n").decode("utf-8", "replace")
+                lines = [line]
+            elif key is not None:
+                lines.append(line)
+    if key is not None:
+        yield _section(key, lines)
+
+# What the current ludusavi index was built from: the manifest version, a hash
+# per game section, the games sharing each contested index key (in manifest
+# order), and which games recent index updates touched.
+class ManifestState:
+    VERSION = 2
+
+    def __init__(self, state_file: str = MANIFEST_STATE_FILE):
+        self.state_file = state_file
+        self.manifest = ""
+        self.index_file = ""
+        self.games: Dict[str, list] = {}
+        self.shared: Dict[str, Dict[str, List[str]]] = {}
+        self.changes: List[Dict] = []
+        self._load()
+
+    def _load(self) -> None:
+        data = load_json_file(self.state_file, "manifest state", self.VERSION)
+        if data is None:
+            return
+        self.manifest = data.get("manifest", "")
+        self.index_file = data.get("index_file", "")
+        self.games = data.get("games", {})
+        self.shared = data.get("shared", {})
+        self.changes = data.get("changes", [])
+
+    def record_change(self, previous_signature: str, signature: str, changed: Set[str]) -> None:
+        if previous_signature == signature:
+            return
+        self.changes.append({"from": previous_signature, "to": signature, "changed": sorted(changed)})
+        del self.changes[:-INDEX_CHANGE_HISTORY]
+
+    def save(self) -> None:
+        data = {"version": self.VERSION, "manifest": self.manifest, "index_file": self.index_file,
+                "games": self.games, "shared": self.shared, "changes": self.changes}
+        save_json_file(data, self.state_file, "manifest state")
+
+def load_index_changes(state_file: str = MANIFEST_STATE_FILE) -> List[Dict]:
+    return ManifestState(state_file).changes
+
+def changed_games_since(changes: List[Dict], signature: str, current: str) -> Optional[Set[str]]:
+    # Games touched between two index signatures, or None when the history does
+    # not connect them (full rebuild, XML change, or too old).
+    by_origin = {change["from"]: change for change in changes}
+    changed: Set[str] = set()
+    for _ in range(len(changes)):
+        if signature == current:
+            return changed
+        change = by_origin.get(signature)
+        if change is None:
+            return None
+        changed.update(change["changed"])
+        signature = change["to"]
+    return changed if signature == current else None
@@ -4,6 +4,7 @@ import logging
 from config import get_current_user
 
 from config import STEAMDECK_PATH, ROOT_PATH
+from path_resolver import get_path_resolver
 
 logger = logging.getLogger('GBM_Backup')
 
@@ -186,13 +187,15 @@ class PathConverter:
             if '<storeUserId>' in str(path):
                 parent = path.parent
                 pattern = r'\d{3,}'
-                if parent.exists():
+                resolved_parent = get_path_resolver().resolve(str(parent))
+                if resolved_parent:
+                    parent = Path(resolved_parent)
                     for child in parent.iterdir():
                         if child.is_dir() and re.fullmatch(pattern, child.name):
-                            new_path = parent / child.name / path.name
-                            if new_path.exists():
+                            new_path = get_path_resolver().resolve(str(parent / child.name / path.name))
+                            if new_path:
                                 results.append({
-                                    'path': new_path,
+                                    'path': Path(new_path),
                                     'meta': variant['meta_path'].replace('<storeUserId>', child.name),
                                     'system': variant['system']
                                 })
@@ -205,9 +208,10 @@ class PathConverter:
                                 'meta': variant['meta_path'],
                                 'system': variant['system']
                             })
-                elif path.exists():
+                # Ludusavi paths are Windows-cased; prefixes live on case-sensitive filesystems.
+                elif resolved := get_path_resolver().resolve(str(path)):
                     results.append({
-                        'path': path,
+                        'path': Path(resolved),
                         'meta': variant['meta_path'],
                         'system': variant['system']
                     })
@@ -0,0 +1,133 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from config import DIRECTORY_CACHE_MAX_ENTRIES
+
+class _DirectoryNode:
+    __slots__ = ("mtime", "entries", "children")
+
+    def __init__(self):
+        self.mtime: Optional[int] = None
+        # Lowercased name -> names on disk; more than one only on case-sensitive filesystems.
+        self.entries: Dict[str, List[str]] = {}
+        self.children: Dict[str, "_DirectoryNode"] = {}
+
+def _split_relative(relative_path: str) -> Optional[List[str]]:
+    relative_path = os.path.normpath(relative_path.replace("\\", "/"))
+    if os.path.isabs(relative_path) or relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+        return None
+    return [part for part in relative_path.split(os.sep) if part and part != os.curdir]
+
+# Resolves Windows-cased paths (ludusavi launch paths, save paths inside Proton
+# prefixes) on case-sensitive filesystems. Listings live in a trie of
+# directories keyed by lowercased name and are re-read when a directory's mtime
+# changes, so one resolver serves the whole process.
+class CaseInsensitiveResolver:
+    def __init__(self, max_nodes: int = DIRECTORY_CACHE_MAX_ENTRIES):
+        self.max_nodes = max_nodes
+        self._roots: Dict[str, _DirectoryNode] = {}
+        self._nodes = 0
+        self._lock = threading.Lock()
+
+    def _root(self, base_path: str) -> _DirectoryNode:
+        key = os.path.normcase(os.path.abspath(base_path))
+        with self._lock:
+            if self._nodes >= self.max_nodes:
+                self._roots.clear()
+                self._nodes = 0
+            node = self._roots.get(key)
+            if node is None:
+                node = self._roots[key] = _DirectoryNode()
+                self._nodes += 1
+            return node
+
+    def _child(self, node: _DirectoryNode, name: str) -> _DirectoryNode:
+        with self._lock:
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = _DirectoryNode()
+                self._nodes += 1
+            return child
+
+    def _entries(self, node: _DirectoryNode, dir_path: str) -> Optional[Dict[str, List[str]]]:
+        try:
+            mtime = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if node.mtime == mtime:
+                return node.entries
+
+        entries: Dict[str, List[str]] = {}
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    entries.setdefault(entry.name.lower(), []).append(entry.name)
+        except OSError:
+            return None
+
+        with self._lock:
+            node.mtime = mtime
+            node.entries = entries
+            node.children = {
+                name: child for name, child in node.children.items() if name in entries.get(name.lower(), ())
+            }
+        return entries
+
+    def resolve_many(self, base_path: str, relative_paths: Iterable[str]) -> Dict[str, Optional[str]]:
+        # Every directory under base_path is stat'ed and listed at most once per
+        # call, however many of the paths share it. Exact-case names win ties.
+        root = self._root(base_path)
+        listed: Dict[str, Optional[Dict[str, List[str]]]] = {}
+        results: Dict[str, Optional[str]] = {}
+        for relative_path in relative_paths:
+            parts = _split_relative(relative_path)
+            if parts is None:
+                results[relative_path] = self.resolve(os.path.join(base_path, relative_path))
+                continue
+
+            results[relative_path] = self._walk(root, base_path, parts, listed)
+        return results
+
+    def _walk(self, node: _DirectoryNode, current: str, parts: List[str],
+              listed: Dict[str, Optional[Dict[str, List[str]]]]) -> Optional[str]:
+        if not parts:
+            return current
+        if current not in listed:
+            listed[current] = self._entries(node, current)
+        part = parts[0]
+        names = (listed[current] or {}).get(part.lower(), ())
+        # Names differing only in case: try the exact one first, then the rest.
+        for name in sorted(names, key=lambda name: name != part):
+            resolved = self._walk(self._child(node, name), os.path.join(current, name), parts[1:], listed)
+            if resolved is not None:
+                return resolved
+        return None
+
+    def resolve(self, path: str) -> Optional[str]:
+        if os.path.exists(path):
+            return path
+        base_path = os.path.abspath(path)
+        while not os.path.isdir(base_path):
+            parent = os.path.dirname(base_path)
+            if parent == base_path:
+                return None
+            base_path = parent
+        relative_path = os.path.relpath(os.path.abspath(path), base_path)
+        return self.resolve_many(base_path, [relative_path])[relative_path]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._roots.clear()
+            self._nodes = 0
+
+_shared_resolver: Optional[CaseInsensitiveResolver] = None
+_shared_resolver_lock = threading.Lock()
+
+def get_path_resolver() -> CaseInsensitiveResolver:
+    global _shared_resolver
+    with _shared_resolver_lock:
+        if _shared_resolver is None:
+            _shared_resolver = CaseInsensitiveResolver()
+        return _shared_resolver
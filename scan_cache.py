@@ -0,0 +1,113 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from config import SCAN_CACHE_FILE
+from manifest_delta import changed_games_since
+from utils import load_json_file, save_json_file
+
+# Entries stay valid while the root folder keeps its inode and every walked
+# directory keeps its mtime; matches are also tied to the index they came from.
+# Walks that ran out of budget are kept only as truncated entries, which never
+# count as hits, so those folders are walked again on the next run.
+class ScanCache:
+    VERSION = 2
+
+    def __init__(self, cache_file: str = SCAN_CACHE_FILE, index_signature: str = "",
+                 index_changes: Optional[List[Dict[str, Any]]] = None):
+        self.cache_file = cache_file
+        self.index_signature = index_signature
+        self.index_changes = index_changes or []
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        data = load_json_file(self.cache_file, "scan cache", self.VERSION)
+        return data.get("folders", {}) if data is not None else {}
+
+    def lookup(self, root_folder_path: str, max_depth: Optional[int]) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(root_folder_path)
+
+        if (entry and not entry.get("truncated") and entry.get("max_depth") == max_depth
+                and self._is_fresh(root_folder_path, entry)):
+            with self.lock:
+                self.hits += 1
+            return entry
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def has_valid_match(self, entry: Dict[str, Any]) -> bool:
+        if entry.get("index") == self.index_signature:
+            return True
+        # A patched index only invalidates matches to the games it changed.
+        # Unmatched folders are retried, since a new game may now match them.
+        changed = changed_games_since(self.index_changes, entry.get("index"), self.index_signature)
+        match = entry.get("match")
+        if changed is None or not match or match.get("game_name") in changed:
+            return False
+        with self.lock:
+            entry["index"] = self.index_signature
+            self.dirty = True
+        return True
+
+    @staticmethod
+    def _is_fresh(root_folder_path: str, entry: Dict[str, Any]) -> bool:
+        try:
+            stat = os.stat(root_folder_path)
+        except OSError:
+            return False
+
+        if stat.st_ino != entry.get("inode") or stat.st_mtime_ns != entry.get("mtime"):
+            return False
+
+        for rel_path, _, mtime in entry.get("dirs", []):
+            try:
+                if os.stat(os.path.join(root_folder_path, rel_path)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+
+        return True
+
+    def store(self, root_folder_path: str, inode: int, mtime: int, dirs: List[list],
+              files: List[list], match: Optional[Dict], max_depth: Optional[int],
+              complete: bool = True, truncated: bool = False) -> None:
+        with self.lock:
+            self.entries[root_folder_path] = {
+                "inode": inode,
+                "mtime": mtime,
+                "dirs": dirs,
+                "files": files,
+                "match": match,
+                "max_depth": max_depth,
+                "complete": complete,
+                "truncated": truncated,
+                "index": self.index_signature
+            }
+            self.dirty = True
+
+    def prune(self, sync_folder: str, present_paths: set) -> None:
+        sync_folder = os.path.normpath(sync_folder)
+        with self.lock:
+            stale = [
+                path for path in self.entries
+                if os.path.normpath(os.path.dirname(path)) == sync_folder and path not in present_paths
+            ]
+            for path in stale:
+                del self.entries[path]
+            if stale:
+                self.dirty = True
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"version": self.VERSION, "folders": self.entries}
+            if save_json_file(data, self.cache_file, "scan cache"):
+                self.dirty = False
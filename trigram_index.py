@@ -0,0 +1,128 @@
+import heapq
+from collections import Counter
+from bisect import bisect_left
+import math
+import re
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Set, Tuple
+
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+def normalize_name(name: str) -> str:
+    return NON_ALNUM.sub(" ", name.lower()).strip()
+
+def trigrams(name: str) -> Set[str]:
+    normalized = normalize_name(name)
+    if not normalized:
+        return set()
+    padded = f" {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def sorted_names(names: Iterable[str]) -> List[str]:
+    # Same order as the binary index stores its keys, so name positions line up.
+    return sorted(names, key=lambda name: name.encode("utf-8"))
+
+def build_trigram_postings(names: Sequence[str]) -> Dict[str, List[int]]:
+    postings: Dict[str, List[int]] = {}
+    for position, name in enumerate(names):
+        for gram in trigrams(name):
+            postings.setdefault(gram, []).append(position)
+    return postings
+
+def idf_weight(name_count: int, df: int) -> float:
+    return math.log((name_count + 1) / (df + 1)) + 1
+
+def build_name_weights(name_count: int, postings: Mapping[str, Sequence[int]]) -> List[float]:
+    weights = [0.0] * name_count
+    for posting in postings.values():
+        weight = idf_weight(name_count, len(posting))
+        for position in posting:
+            weights[position] += weight
+    return weights
+
+class TrigramIndex:
+    # IDF-weighted Dice similarity over character trigrams. Query trigrams are
+    # walked rarest first and new candidates stop being admitted once the weight
+    # left cannot reach the cutoff; the rarer-first walk keeps common trigrams
+    # ("the", "game") out of candidate generation.
+    def __init__(self, name_at: Callable[[int], str], name_count: int,
+                 postings: Mapping[str, Sequence[int]], name_weights: Sequence[float]):
+        self._name_at = name_at
+        self.name_count = name_count
+        self._postings = postings
+        self._name_weights = name_weights
+        self._idf: Dict[str, float] = {}
+
+    @classmethod
+    def from_names(cls, names: Sequence[str], postings: Mapping[str, Sequence[int]] = None,
+                   name_weights: Sequence[float] = None) -> "TrigramIndex":
+        if postings is None:
+            postings = build_trigram_postings(names)
+        if name_weights is None:
+            name_weights = build_name_weights(len(names), postings)
+        return cls(names.__getitem__, len(names), postings, name_weights)
+
+    def idf(self, gram: str) -> float:
+        weight = self._idf.get(gram)
+        if weight is None:
+            posting = self._postings.get(gram)
+            weight = idf_weight(self.name_count, len(posting) if posting is not None else 0)
+            self._idf[gram] = weight
+        return weight
+
+    def _contains(self, posting: Sequence[int], position: int) -> bool:
+        found = bisect_left(posting, position)
+        return found < len(posting) and posting[found] == position
+
+    def search(self, query: str, k: int = 5, cutoff: float = 0.0) -> List[Tuple[float, str]]:
+        query_grams = trigrams(query)
+        if not query_grams or not self.name_count:
+            return []
+
+        weighted = sorted(((self.idf(gram), gram) for gram in query_grams), reverse=True)
+        query_weight = sum(weight for weight, _ in weighted)
+        # Dice >= cutoff with a name weight of at least the shared weight means
+        # sharing at least this much weight with the query.
+        needed = cutoff * query_weight / (2 - cutoff) if cutoff < 2 else query_weight
+
+        # Counting is done by Counter in C; walked trigrams are sorted by weight,
+        # so a name seen in n of them shares at most top_weights[n] through them.
+        remaining = query_weight
+        counts = Counter()
+        top_weights = [0.0]
+        for weight, gram in weighted:
+            if remaining < needed or remaining <= 0:
+                break
+            posting = self._postings.get(gram)
+            if posting is not None:
+                counts.update(posting)
+            remaining -= weight
+            top_weights.append(top_weights[-1] + weight)
+
+        query_postings = [
+            (weight, self._postings[gram]) for weight, gram in weighted if gram in self._postings
+        ]
+        name_weights = self._name_weights
+        results: List[Tuple[float, str]] = []
+        floor = cutoff
+        for position, count in counts.most_common():
+            upper = min(top_weights[count] + remaining, query_weight)
+            if upper < needed or 2 * upper / (query_weight + upper) < floor:
+                break
+            name_weight = name_weights[position]
+            if 2 * upper / (query_weight + name_weight) < floor:
+                continue
+            common = sum(weight for weight, posting in query_postings if self._contains(posting, position))
+            score = 2 * common / (query_weight + name_weight)
+            if score < floor:
+                continue
+            heapq.heappush(results, (score, self._name_at(position)))
+            if len(results) > k:
+                heapq.heappop(results)
+            if len(results) == k:
+                floor = max(cutoff, results[0][0])
+
+        return sorted(results, key=lambda result: (-result[0], result[1]))
+
+    def best_match(self, query: str, cutoff: float = 0.0) -> Tuple[float, str]:
+        results = self.search(query, 1, cutoff)
+        return results[0] if results else (0.0, "")
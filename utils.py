@@ -1,17 +1,49 @@
-from functools import wraps
+from functools import partial, wraps
 import hashlib
+import json
 import logging
 import os
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 from config import get_current_user
 import subprocess
-from concurrent.futures import ThreadPoolExecutor
 
 from config import ALTERNATIVE_BACKUPS_PATH_FILE, SCRIPT_DIR, SERVICE_FILE, SYNC_FOLDERS_FILE
+from io_scheduler import get_io_scheduler
 
 logger = logging.getLogger("no_steam_to_steam.log")
 
+def load_json_file(file_path: str, description: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    # None when the file is missing, unreadable or written for another version.
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Error loading {description} {file_path}: {str(e)}")
+        return None
+
+    if not isinstance(data, dict) or (version is not None and data.get("version") != version):
+        return None
+    return data
+
+def save_json_file(data: Any, file_path: str, description: str, indent: Optional[int] = None) -> bool:
+    # Written to a temp file and renamed over file_path, so readers never see a partial file.
+    temp_path = file_path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent,
+                      separators=(',', ':') if indent is None else None)
+        os.replace(temp_path, file_path)
+        return True
+    except (IOError, TypeError, ValueError) as e:
+        logger.error(f"Error saving {description}: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
 def compute_hash(path, max_workers=None, size_threshold=100*1024*1024):
     path = Path(path)
 
@@ -98,9 +130,12 @@ def _hash_dir(dir_path, max_workers=None, size_threshold=150*1024*1024):
         except Exception:
             return b'\x00' * 32
 
-    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
-        for file_hash in executor.map(process_file, files):
-            hasher.update(file_hash)
+    file_hashes = get_io_scheduler().run(
+        ((str(dir_path), partial(process_file, file_item)) for file_item in files),
+        max_workers or os.cpu_count()
+    )
+    for file_hash in file_hashes:
+        hasher.update(file_hash)
 
     return hasher.hexdigest()
 